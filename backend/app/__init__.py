@@ -0,0 +1,5 @@
+import time
+
+# Start of the app import in this process (before FastAPI, settings, services, routes),
+# reported by app.main when the worker is ready
+IMPORT_STARTED = time.perf_counter()
@@ -1,23 +1,109 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 
 class Settings(BaseSettings):
     # OpenWeatherMap
     openweather_api_key: str
     openweather_base_url: str = "https://api.openweathermap.org/data/2.5"
+    openweather_geo_url: str = "http://api.openweathermap.org/geo/1.0"
+    
+    # Observability
+    log_level: str = "INFO"
+    log_json: bool = True  # One JSON object per line; plain text otherwise
+    metrics_enabled: bool = True  # /metrics + per-request latency middleware
+    
+    # Upstream resilience
+    http_retries: int = 1  # Retries on connection errors, timeouts and 5xx
+    http_retry_backoff: float = 0.2  # seconds, full jitter, doubled per attempt
+    hedge_enabled: bool = False  # Duplicate a call still pending after the endpoint's p95
+    hedge_min_delay: float = 0.05
+    breaker_failure_threshold: int = 5  # Consecutive failures before the circuit opens
+    breaker_reset_timeout: float = 30.0
+    
+    # Upstream call quota (token bucket shared through Redis)
+    rate_limit_enabled: bool = True
+    openweather_calls_per_minute: int = 60
+    rate_limit_burst: int = 10
+    rate_limit_max_wait_interactive: float = 2.0  # seconds
+    rate_limit_max_wait_batch: float = 10.0
+    rate_limit_max_wait_background: float = 30.0
+    rate_limit_usage_minutes: int = 10  # Minutes reported by /api/stats
+    
+    # HTTP client (shared connection pool to OpenWeatherMap)
+    http_timeout: float = 5.0  # Write and pool timeouts
+    http_connect_timeout: float = 2.0
+    http_read_timeout: float = 3.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = True
     
     # Redis
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
     redis_password: str = ""
-    cache_ttl: int = 1800  # 30 minutes
+    redis_socket_path: str = ""  # Unix socket of a co-located Redis (overrides host/port)
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0  # Wait for a free pooled connection
+    redis_socket_timeout: float = 2.0
+    cache_ttl: int = 1800  # 30 minutes (soft TTL: fresh)
+    cache_stale_ttl: int = 1800  # Served stale + refreshed in background for this long after cache_ttl
+    geocode_ttl: int = 604800  # 7 days (city -> coordinates)
+    cache_format: Literal["json", "msgpack"] = "json"  # Storage format of new entries (all are readable)
+    cache_compression: Literal["none", "zlib", "zstd"] = "none"  # zstd needs the zstandard package
+    cache_compression_level: int = 3
+    
+    # HTTP caching of /api/weather (ETag, Cache-Control, 304) and response compression
+    response_compression: bool = True  # gzip, or brotli with the brotli package
+    response_compression_min_size: int = 512  # bytes
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 5
+    
+    # Canonical locations: coordinates snapped to a grid, nearest cached cell reused
+    coord_grid_size: float = 0.01  # degrees (0.01 ~ 1.1 km)
+    nearest_radius_km: float = 2.0  # 0 = exact cell only
+    cells_prune_interval: int = 300  # seconds between removals of expired cells from the nearest-cell index
+    
+    # In-process L1 cache in front of Redis
+    l1_cache_enabled: bool = True
+    l1_cache_size: int = 1024
+    l1_cache_max_ttl: int = 0  # 0 = follow the Redis expiry
+    l1_stale_ttl: int = 5  # Stale entries stay in L1 this long while they are refreshed (0 = not kept)
+    l1_invalidation_pubsub: bool = True  # Invalidate other workers on DELETE /api/cache
+    l1_invalidation_backoff: float = 0.5  # seconds before resubscribing, full jitter, doubled per failure
+    l1_invalidation_backoff_max: float = 30.0
+    
+    # Batch endpoint
+    batch_max_items: int = 500
+    batch_concurrency: int = 10  # Concurrent upstream fetches per batch
+    
+    # Refresh-ahead of the most requested keys
+    refresh_ahead_enabled: bool = False
+    refresh_top_n: int = 100
+    refresh_ahead_seconds: int = 60
+    refresh_interval: int = 30
+    refresh_tracked_keys: int = 10000  # Keys whose request counts are kept (popularity), bounds memory
+    
+    # Request coalescing (single-flight) on cache misses
+    singleflight_distributed: bool = False  # Redis lock across workers/replicas
+    singleflight_lock_ttl: int = 10000  # ms
+    singleflight_wait_timeout: float = 10.0
+    singleflight_poll_interval: float = 0.05
+    
+    # Offline city index for /api/search (empty path = bundled GeoNames extract)
+    city_index_enabled: bool = True
+    city_index_path: str = ""
     
     # API
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     cors_origins: str = "http://localhost:4200"
     
+    # Production server (python -m app.server)
+    web_concurrency: int = 0  # Workers; 0 = one per available CPU (affinity and cgroup quota)
+    warmup_cities: str = ""  # Hot cities loaded into the cache when a worker starts, ';'-separated ("Paris;London;Paris, US")
+    
     # Environment
     env: str = "development"
     
@@ -25,6 +111,10 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.cors_origins.split(",")]
     
+    @property
+    def warmup_cities_list(self) -> List[str]:
+        return [city.strip() for city in self.warmup_cities.split(";") if city.strip()]
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,19 +1,105 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Tuple, Union
+import asyncio
+import logging
+import os
 import time
+import uuid
+import orjson
 from datetime import datetime
 
+from app import IMPORT_STARTED
 from app.config import settings
-from app.models import WeatherResponse, ErrorResponse
-from app.services.cache_service import cache_service
+from app.models import WeatherResponse, ErrorResponse, BatchRequest, BatchResponse
+from app.services.cache_service import cache_service, CachedSeries
 from app.services.weather_service import weather_service
+from app.services.singleflight import singleflight
+from app.services.refresher import refresher
+from app.services.city_index import city_index
+from app.services.rate_limiter import rate_limiter, Priority, upstream_priority, RateLimitExceeded
+from app.services.circuit_breaker import CircuitOpenError
+from app.utils.log import setup_logging
+from app.utils.normalizer import forecast_view
+from app.utils import http_cache, metrics
+
+setup_logging(settings.log_level, settings.log_json)
+logger = logging.getLogger(__name__)
+
+# Boot times of this worker (seconds), reported by /api/stats
+startup_stats: dict = {}
+
+# Only one worker fetches the missing warmup cities upstream
+WARMUP_LOCK_TTL_MS = 60000
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Per-worker startup and shutdown: opens the upstream HTTP client and the
+    Redis pool (nothing is connected at import time), the L1 invalidation
+    listener and the refresher, then warms the cache in the background.
+    """
+    started = time.perf_counter()
+    await weather_service.start()
+    await cache_service.start()
+    refresher.start(_fetch_and_cache)
+    warmup = asyncio.create_task(_warmup(settings.warmup_cities_list)) if settings.warmup_cities_list else None
+    
+    startup_stats.update(import_s=round(IMPORT_SECONDS, 3), startup_s=round(time.perf_counter() - started, 3))
+    metrics.STARTUP_DURATION.labels('import').observe(IMPORT_SECONDS)
+    metrics.STARTUP_DURATION.labels('startup').observe(startup_stats['startup_s'])
+    logger.info("worker ready", extra={"pid": os.getpid(), **startup_stats})
+    yield
+    if warmup is not None:
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+    await refresher.stop()
+    await singleflight.stop()
+    await cache_service.close()
+    await weather_service.close()
+
+async def _warmup(cities: List[str]):
+    """
+    Preloads hot cities: cached entries go into this worker's L1 (one MGET),
+    missing ones are fetched upstream at background priority by the single
+    worker holding the warmup lock.
+    """
+    started = time.perf_counter()
+    keys = await cache_service.resolve_keys([(city, None, None) for city in cities])
+    cached = await cache_service.get_many(keys)
+    missing = [(city, key) for city, key, entry in zip(cities, keys, cached) if entry is None]
+    
+    fetched = errors = 0
+    if missing and await cache_service.acquire_lock("warmup", uuid.uuid4().hex, WARMUP_LOCK_TTL_MS):
+        upstream_priority.set(Priority.BACKGROUND)
+        semaphore = asyncio.Semaphore(settings.batch_concurrency)
+        
+        async def fetch(city: str, key: str):
+            async with semaphore:
+                await singleflight.do(key, lambda: _fetch_and_cache(city, None, None))
+        
+        results = await asyncio.gather(*(fetch(city, key) for city, key in missing), return_exceptions=True)
+        errors = sum(1 for result in results if isinstance(result, Exception))
+        fetched = len(results) - errors
+    
+    elapsed = time.perf_counter() - started
+    startup_stats['warmup'] = {
+        'cities': len(cities), 'cached': len(cities) - len(missing), 'fetched': fetched, 'errors': errors,
+        'seconds': round(elapsed, 3)
+    }
+    metrics.STARTUP_DURATION.labels('warmup').observe(elapsed)
+    logger.info("warmup done", extra=startup_stats['warmup'])
 
 # Initialization of the FastAPI application
 app = FastAPI(
     title="Weather API",
     description="Centralized weather API with intelligent caching and data normalization",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -25,6 +111,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """422 as FastAPI renders it, with non-finite inputs (NaN, Infinity in a JSON body) echoed as null"""
+    return Response(
+        content=orjson.dumps({"detail": jsonable_encoder(exc.errors())}),
+        status_code=422,
+        media_type="application/json"
+    )
+
 @app.get("/")
 def read_root():
     """Health endpoint"""
@@ -36,20 +134,151 @@ def read_root():
     }
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Comprehensive health check"""
-    redis_status = cache_service.health_check()
+    redis_status = await cache_service.health_check()
+    breaker = weather_service.breaker.get_state()
     return {
-        "status": "healthy" if redis_status else "degraded",
+        "status": "healthy" if redis_status and breaker["state"] == "closed" else "degraded",
         "redis": "connected" if redis_status else "disconnected",
+        "upstream": breaker,
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/api/stats")
+async def get_stats():
+    """Cache hit rates (L1/L2), background refresh, request coalescing counters and worker boot times"""
+    return {
+        "cache": cache_service.get_stats(),
+        "refresh": refresher.get_stats(),
+        "rate_limit": await rate_limiter.get_stats(),
+        "upstream": weather_service.get_stats(),
+        "singleflight": singleflight.get_stats(),
+        "startup": startup_stats,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus metrics (latency histograms, cache tier and error counters)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(content=metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE_LATEST})
+
+async def _fetch(city: Optional[str], lat: Optional[float], lon: Optional[float]) -> dict:
+    """Fetches the forecast series from OpenWeatherMap, using and feeding the geocode cache"""
+    coords = await cache_service.get_coords(city) if city else None
+    series = await weather_service.get_forecast(city=city, lat=lat, lon=lon, coords=coords)
+    
+    if city:
+        await cache_service.set_coords(city, series['latitude'], series['longitude'])
+    return series
+
+def _standard_view(series: dict) -> dict:
+    """Standard response (12 hours, 3 days) of a series, as cached"""
+    weather_data = WeatherResponse(**forecast_view(series))
+    with metrics.SERIALIZE_LATENCY.labels('model_dump').time():
+        return weather_data.model_dump(mode='json')
+
+def _standard_response(series: dict, data: Union[dict, CachedSeries]) -> dict:
+    """
+    Standard response of a coalesced miss: as fetched, or derived from the
+    cache entry the distributed poll found (another worker filled it), then
+    marked cached like a hit
+    """
+    if not isinstance(data, CachedSeries):
+        return data
+    response = _standard_view(series)
+    response.update(cached=True, stale=data.stale, cache_expires_at=data.expires_at)
+    return response
+
+async def _fetch_view(city: Optional[str], lat: Optional[float], lon: Optional[float]) -> Tuple[dict, dict]:
+    """Fetches the forecast series and derives its standard response: (series, standard response)"""
+    series = await _fetch(city, lat, lon)
+    return series, _standard_view(series)
+
+async def _fetch_and_cache(
+    city: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+    coalesce: bool = False
+) -> Tuple[dict, dict]:
+    """
+    Fetches from OpenWeatherMap and saves the standard response and the series to cache
+    
+    With `coalesce`, the write shares one pipeline with the other entries
+    completing in the same loop turn (batch items).
+    """
+    series, data = await _fetch_view(city, lat, lon)
+    
+    # Save to cache (city lookups are stored under the cell of their resolved coordinates)
+    lat, lon = (series['latitude'], series['longitude']) if city else (lat, lon)
+    if coalesce:
+        await cache_service.set_coalesced(data, lat, lon, series=series)
+    else:
+        await cache_service.set(data, lat=lat, lon=lon, series=series)
+    return series, data
+
+async def _cached_series(key: str, city: Optional[str] = None) -> Optional[Tuple[dict, CachedSeries]]:
+    """
+    Cached forecast series, if present, as (series, cache entry) where a
+    fetch returns (series, standard response): the response is derived by
+    the caller if it needs it, with the entry's cache fields.
+    
+    A city not geocoded yet is keyed by name, but whoever fetches it stores
+    the entry under the cell of its resolved coordinates: the key is
+    resolved again (geocode cache) until the mapping appears.
+    """
+    if city and key == cache_service._generate_key(city):
+        key = await cache_service.resolve_key(city)
+    cached = await cache_service.get_series(key)
+    return (cached.series, cached) if cached else None
+
+def _view_body(series: dict, view: tuple, cached: Optional[CachedSeries]) -> bytes:
+    """Serialized view of a series, with the cache fields of the series entry"""
+    data = forecast_view(series, *view)
+    data['cached'] = cached is not None
+    data['stale'] = cached.stale if cached else False
+    data['cache_expires_at'] = cached.expires_at if cached else None
+    with metrics.SERIALIZE_LATENCY.labels('view').time():
+        return orjson.dumps(data)
+
+async def _view_response(request: Request, key: str, city: Optional[str], lat: Optional[float], lon: Optional[float],
+                         view: tuple) -> Response:
+    """
+    Non-standard view, derived from the cached series (one upstream fetch serves every view).
+    
+    Its ETag is a hash of the series entry and the view parameters, so a
+    304 is answered without deriving the view.
+    """
+    cached = await cache_service.get_series(key)
+    if cached:
+        if cached.stale:
+            refresher.schedule(key, city, lat, lon)
+        tag = http_cache.etag(f"{key}|{cached.expires_at}|{cached.stale}|{view}".encode())
+        return http_cache.respond(
+            request, lambda: _view_body(cached.series, view, cached), tag, cached.expires_at, cached.stale
+        )
+    
+    series, data = await singleflight.do(
+        key,
+        lambda: _fetch_and_cache(city, lat, lon),
+        poll=lambda: _cached_series(key, city)
+    )
+    # Filled by another worker meanwhile (distributed poll): a cached series
+    cached = data if isinstance(data, CachedSeries) else None
+    return Response(content=_view_body(series, view, cached), media_type="application/json")
+
 @app.get("/api/weather", response_model=WeatherResponse)
-def get_weather(
+async def get_weather(
+    request: Request,
     city: Optional[str] = Query(None, description="City name"),
-    lat: Optional[float] = Query(None, description="Latitude"),
-    lon: Optional[float] = Query(None, description="Longitude")
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude"),
+    hours: int = Query(12, ge=1, le=40, description="Number of 3-hour forecast items"),
+    days: int = Query(3, ge=1, le=5, description="Number of daily forecast items"),
+    units: Literal["metric", "imperial", "standard"] = Query("metric", description="°C and km/h, °F and mph, or K and m/s"),
+    tz: Literal["server", "location", "utc"] = Query("server", description="Timezone of times and day boundaries")
 ):
     """
     Retrieves weather data for a city or coordinates.
@@ -57,10 +286,18 @@ def get_weather(
     - **city**: City name (e.g., Paris, London)
     - **lat**: Latitude (e.g., 48.8566)
     - **lon**: Longitude (e.g., 2.3522)
+    - **hours**, **days**, **units**, **tz**: response view (see below)
     
     Returns current data, hourly forecasts (12h), and daily forecasts (3 days).
+    Other views (up to 40 items / 5 days, other units, days split at the
+    location's midnight) are derived from the same cached 5-day forecast,
+    without another upstream call.
+    
+    Cached responses carry ETag, Last-Modified and Cache-Control (max-age =
+    remaining cache TTL); If-None-Match / If-Modified-Since get a 304.
+    gzip/brotli are negotiated, compressed bodies are cached with the entry.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Parameter validation
     if not city and (lat is None or lon is None):
@@ -70,38 +307,152 @@ def get_weather(
         )
     
     try:
-        # Cache check
-        cached_data = cache_service.get(city=city, lat=lat, lon=lon)
+        key = await cache_service.resolve_key(city, lat, lon)
+        refresher.track(key, city, lat, lon)
         
-        if cached_data:
-            print(f"✅ Cache HIT - Time: {(time.time() - start_time) * 1000:.0f}ms")
-            return WeatherResponse(**cached_data)
+        view = (hours, days, units, tz)
+        if view != (12, 3, "metric", "server"):
+            return await _view_response(request, key, city, lat, lon, view)
         
-        # Cache MISS - External API call
-        print(f"⚠️  Cache MISS - External API call...")
-        weather_data = weather_service.get_weather(city=city, lat=lat, lon=lon)
+        # Cache check (pre-serialized body, returned as is; nearest cached cell for coordinates)
+        cached = await cache_service.lookup(key) if city else await cache_service.lookup(key, lat, lon)
         
-        # Save to cache
-        cache_service.set(
-            weather_data.model_dump(mode='json'),
-            city=weather_data.city if city else None,
-            lat=lat,
-            lon=lon
+        if cached:
+            if cached.stale:
+                # Serve stale immediately, refresh in background
+                refresher.schedule(key, city, lat, lon)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("cache hit", extra={"key": key, "stale": cached.stale, "ms": round((time.perf_counter() - start_time) * 1000, 2)})
+            return http_cache.respond(request, cached.body, cached.etag, cached.expires_at, cached.stale, cached.encoded)
+        
+        # Cache MISS - External API call (coalesced per cache key), standard response as cached by the fetch
+        series, data = await singleflight.do(
+            key,
+            lambda: _fetch_and_cache(city, lat, lon),
+            poll=lambda: _cached_series(key, city)
         )
+        data = _standard_response(series, data)
         
-        elapsed = (time.time() - start_time) * 1000
-        print(f"✅ Data retrieved and cached - Time: {elapsed:.0f}ms")
+        logger.info("cache miss", extra={"key": key, "ms": round((time.perf_counter() - start_time) * 1000, 1)})
         
-        return weather_data
+        return Response(content=orjson.dumps(data), media_type="application/json")
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(int(settings.rate_limit_max_wait_interactive) + 1)}
+        )
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(settings.breaker_reset_timeout)))}
+        )
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.exception("weather request failed", extra={"city": city, "lat": lat, "lon": lon})
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
+def _batch_item(index: int, body: bytes) -> bytes:
+    """Successful batch item around a pre-serialized weather body"""
+    return b'{"index":%d,"status":200,"data":%s,"error":null}' % (index, body)
+
+def _batch_error(index: int, status: int, error: str) -> bytes:
+    """Failed batch item"""
+    return orjson.dumps({"index": index, "status": status, "data": None, "error": error})
+
+@app.post("/api/weather/batch", response_model=BatchResponse)
+async def get_weather_batch(
+    request: BatchRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as they complete")
+):
+    """
+    Retrieves weather data for many cities and/or coordinates in one call.
+    
+    - **locations**: List of `{"city": ...}` or `{"lat": ..., "lon": ...}`
+    - **stream**: Send one NDJSON line per location as soon as it is ready
+    
+    Cache hits are resolved with a single Redis MGET; misses are fetched
+    upstream with bounded concurrency and each is written back as soon as
+    it completes (items completing together share one pipeline).
+    Each item carries its own status and error.
+    """
+    locations = request.locations
+    if len(locations) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.batch_max_items} locations per batch"
+        )
+    
+    ready: List[Tuple[int, bytes, bool]] = []
+    valid = []
+    for i, loc in enumerate(locations):
+        if not loc.city and (loc.lat is None or loc.lon is None):
+            ready.append((i, _batch_error(i, 400, "You must provide either 'city' or both 'lat' and 'lon'"), False))
+        else:
+            valid.append(i)
+    keys = dict(zip(valid, await cache_service.resolve_keys(
+        [(locations[i].city, locations[i].lat, locations[i].lon) for i in valid]
+    )))
+    
+    # Cache check (L1, then one MGET)
+    misses = []
+    for (i, key), cached in zip(keys.items(), await cache_service.get_many(list(keys.values()))):
+        if cached:
+            if cached.stale:
+                refresher.schedule(key, locations[i].city, locations[i].lat, locations[i].lon)
+            ready.append((i, _batch_item(i, cached.body), True))
+        else:
+            misses.append(i)
+    
+    # Cache MISS - bounded concurrent upstream calls, each written back by its (coalesced) call
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    
+    async def fetch(i: int) -> Tuple[int, bytes, bool]:
+        loc = locations[i]
+        upstream_priority.set(Priority.BATCH)
+        async with semaphore:
+            try:
+                series, data = await singleflight.do(
+                    keys[i],
+                    lambda: _fetch_and_cache(loc.city, loc.lat, loc.lon, coalesce=True)
+                )
+            except ValueError as e:
+                return i, _batch_error(i, 404, str(e)), False
+            except (RateLimitExceeded, CircuitOpenError) as e:
+                return i, _batch_error(i, 503, str(e)), False
+            except Exception as e:
+                return i, _batch_error(i, 500, f"Server error: {str(e)}"), False
+        return i, _batch_item(i, orjson.dumps(_standard_response(series, data))), True
+    
+    if stream:
+        async def lines():
+            tasks = [asyncio.ensure_future(fetch(i)) for i in misses]
+            try:
+                for _, item, _ in ready:
+                    yield item + b"\n"
+                for task in asyncio.as_completed(tasks):
+                    _, item, _ = await task
+                    yield item + b"\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    ready.extend(await asyncio.gather(*(fetch(i) for i in misses)))
+    
+    ready.sort(key=lambda result: result[0])
+    errors = sum(1 for _, _, ok in ready if not ok)
+    body = b'{"results":[%s],"count":%d,"errors":%d}' % (
+        b",".join(item for _, item, _ in ready), len(ready), errors
+    )
+    return Response(content=body, media_type="application/json")
+
 @app.get("/api/search")
-def search_cities(
+async def search_cities(
     q: str = Query(..., min_length=2, description="Search term"),
     limit: int = Query(5, ge=1, le=10, description="Number of results")
 ):
@@ -112,7 +463,17 @@ def search_cities(
     - **limit**: Maximum number of results (1-10)
     """
     try:
-        cities = weather_service.search_city(q, limit)
+        # Local index first, upstream only when it has nothing
+        cities = city_index.search(q, limit) if settings.city_index_enabled else []
+        
+        if not cities:
+            cities = await weather_service.search_city(q, limit)
+            
+            # Feed the geocode cache (best match per name wins, never overwrites /weather)
+            for result in cities:
+                if result['name'] and result['lat'] is not None and result['lon'] is not None:
+                    await cache_service.set_coords(result['name'], result['lat'], result['lon'], overwrite=False)
+        
         return {
             "query": q,
             "results": cities,
@@ -122,10 +483,10 @@ def search_cities(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/cache")
-def clear_cache(
+async def clear_cache(
     city: Optional[str] = Query(None),
-    lat: Optional[float] = Query(None),
-    lon: Optional[float] = Query(None)
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180)
 ):
     """
     Deletes a cache entry (useful for forcing a refresh).
@@ -137,7 +498,7 @@ def clear_cache(
         )
     
     try:
-        cache_service.delete(city=city, lat=lat, lon=lon)
+        await cache_service.delete(city=city, lat=lat, lon=lon)
         return {
             "status": "success",
             "message": "Cache successfully deleted"
@@ -145,6 +506,8 @@ def clear_cache(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -3,13 +3,13 @@ from typing import List, Optional
 from datetime import datetime
 
 class CurrentWeather(BaseModel):
-    temperature: float = Field(..., description="Temperature in°C")
-    feels_like: float = Field(..., description="Temperature feels like in °C")
+    temperature: float = Field(..., description="Temperature in °C, °F or K (units)")
+    feels_like: float = Field(..., description="Temperature feels like in °C, °F or K (units)")
     condition: str = Field(..., description="Weather condition (e.g., Clear, Clouds, Rain)")
     condition_description: str = Field(..., description="Detailed description")
     icon: str = Field(..., description="OpenWeather icon code")
     humidity: int = Field(..., description="Humidity in %")
-    wind_speed: float = Field(..., description="Wind speed in km/h")
+    wind_speed: float = Field(..., description="Wind speed in km/h, mph or m/s (units)")
     precipitation_probability: int = Field(default=0, description="Precipitation probability in %")
     timestamp: datetime = Field(..., description="Timestamp of the data")
 
@@ -37,11 +37,31 @@ class WeatherResponse(BaseModel):
     longitude: float
     timezone: int
     current: CurrentWeather
-    hourly: List[HourlyForecast] = Field(default_factory=list, max_length=12)
-    daily: List[DailyForecast] = Field(default_factory=list, max_length=3)
+    hourly: List[HourlyForecast] = Field(default_factory=list, max_length=40, description="3-hour forecasts (hours, 12 by default)")
+    daily: List[DailyForecast] = Field(default_factory=list, max_length=5, description="Daily forecasts (days, 3 by default)")
     cached: bool = Field(default=False, description="Data served from cache")
+    stale: bool = Field(default=False, description="Cached data past its TTL, being refreshed in background")
     cache_expires_at: Optional[datetime] = None
 
+class BatchLocation(BaseModel):
+    city: Optional[str] = None
+    lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    lon: Optional[float] = Field(default=None, ge=-180, le=180)
+
+class BatchRequest(BaseModel):
+    locations: List[BatchLocation] = Field(..., min_length=1, description="Cities and/or lat/lon pairs")
+
+class BatchItem(BaseModel):
+    index: int = Field(..., description="Position of the location in the request")
+    status: int = Field(..., description="HTTP-like status of this item (200, 400, 404, 500, 503)")
+    data: Optional[WeatherResponse] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+    count: int
+    errors: int
+
 class ErrorResponse(BaseModel):
     error: str
     detail: Optional[str] = None
@@ -0,0 +1,56 @@
+"""
+Production entry point: N uvicorn workers with uvloop and httptools, no reload.
+
+    python -m app.server
+    WEB_CONCURRENCY=4 python -m app.server
+
+Each worker imports the app and opens its own clients in the lifespan hook
+(nothing is connected at import time, see main.lifespan).
+"""
+import math
+import os
+import tempfile
+
+import uvicorn
+
+from app.config import settings
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by the cgroup (v2) CPU quota of the container"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY, or one worker per available CPU"""
+    return settings.web_concurrency if settings.web_concurrency > 0 else available_cpus()
+
+def main():
+    workers = worker_count()
+    if workers > 1 and settings.metrics_enabled and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Aggregate /metrics across workers (read by the workers, which inherit the environment)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="weather-metrics-")
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        log_level=settings.log_level.lower(),
+        access_log=False,  # Request latency is in /metrics; app logs are structured
+        proxy_headers=True
+    )
+
+if __name__ == "__main__":
+    main()
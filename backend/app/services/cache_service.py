@@ -1,69 +1,671 @@
-import redis
-import json
-from typing import Optional
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+import redis.asyncio as redis
+import orjson
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from datetime import datetime, timedelta
 from app.config import settings
+from app.services.local_cache import LRUCache
+from app.utils.http_cache import etag
+from app.utils.payload import encode_entry, decode_entry, mark_stale, pack_entry, pack_series, unpack_series
+from app.utils.metrics import CACHE_REQUESTS, REDIS_ERRORS, REDIS_LATENCY, SERIALIZE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Index géospatial des cellules en cache (recherche du plus proche voisin),
+# et expiration Redis de chaque cellule (timestamp Unix) pour l'élagage
+CELLS_KEY = "weather:cells"
+CELLS_EXPIRY_KEY = "weather:cells:expiry"
+NEAREST_CANDIDATES = 3
+NEAREST_SCAN = 32  # Cellules examinées au plus (les expirées sont écartées)
+CELLS_PRUNE_BATCH = 1000
+
+# Canal pub/sub d'invalidation du cache L1 entre workers
+INVALIDATION_CHANNEL = "weather:invalidate"
+
+# Supprime le verrou uniquement s'il appartient encore à l'appelant
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class CachedPayload(NamedTuple):
+    """Entrée de cache prête à être renvoyée telle quelle (ETag calculé une fois par entrée)"""
+    body: bytes
+    stale: bool
+    expires_at: str
+    etag: str
+    encoded: Dict[str, bytes]  # Corps compressés (gzip, br), remplis au premier hit qui les demande
+    
+    @classmethod
+    def of(cls, body: bytes, stale: bool, expires_at: str) -> "CachedPayload":
+        return cls(body, stale, expires_at, etag(body), {})
+
+class CachedSeries(NamedTuple):
+    """Série de prévisions brute d'une cellule (source de toutes les vues)"""
+    series: dict
+    stale: bool
+    expires_at: str
+
+def create_pool() -> redis.BlockingConnectionPool:
+    """
+    Pool de connexions Redis asynchrone, de taille fixe.
+    
+    Valeurs binaires (pas de décodage) ; socket Unix si configuré. Le parseur
+    hiredis est utilisé automatiquement lorsqu'il est installé.
+    """
+    kwargs = dict(
+        db=settings.redis_db,
+        password=settings.redis_password if settings.redis_password else None,
+        socket_timeout=settings.redis_socket_timeout,
+        decode_responses=False
+    )
+    if settings.redis_socket_path:
+        kwargs.update(connection_class=redis.UnixDomainSocketConnection, path=settings.redis_socket_path)
+    else:
+        kwargs.update(host=settings.redis_host, port=settings.redis_port)
+    return redis.BlockingConnectionPool(
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        **kwargs
+    )
 
 class CacheService:
     def __init__(self):
-        self.client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_db,
-            password=settings.redis_password if settings.redis_password else None,
-            decode_responses=True
-        )
+        self._client: Optional[redis.Redis] = None
+        self._pid: Optional[int] = None
+        # Cache L1 en mémoire devant Redis (L2)
+        self.local = LRUCache(settings.l1_cache_size) if settings.l1_cache_enabled else None
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'nearest_hits': 0, 'misses': 0}
+        self._pubsub_task: Optional[asyncio.Task] = None
+        self._prune_task: Optional[asyncio.Task] = None
+        # Écritures groupées (set_coalesced) : entrées en attente et pipeline à venir
+        self._pending_writes: List[Tuple[str, dict, Optional[dict]]] = []
+        self._write_flush: Optional[asyncio.Task] = None
+    
+    @property
+    def client(self) -> redis.Redis:
+        """
+        Client Redis du worker, créé au premier usage.
+        
+        Rien n'est ouvert à l'import : chaque worker (et chaque processus
+        forké) a son propre pool, lié à sa boucle d'événements.
+        """
+        if self._client is None or self._pid != os.getpid():
+            self._client = redis.Redis(connection_pool=create_pool())
+            self._pid = os.getpid()
+        return self._client
+    
+    @client.setter
+    def client(self, client: redis.Redis):
+        self._client = client
+        self._pid = os.getpid()
+    
+    async def start(self):
+        """Ouvre le pool du worker (première connexion), l'écoute des invalidations L1 et l'élagage de l'index des cellules"""
+        if not await self.health_check():
+            logger.warning("Redis unreachable at startup")
+        await self.start_invalidation_listener()
+        if settings.nearest_radius_km > 0 and settings.cells_prune_interval > 0 and self._prune_task is None:
+            self._prune_task = asyncio.create_task(self._prune_cells_loop())
+    
+    async def close(self):
+        """Ferme les connexions du pool"""
+        await self.stop_invalidation_listener()
+        if self._prune_task:
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _snap(self, value: float) -> float:
+        """Aligne une coordonnée sur la grille configurée"""
+        grid = settings.coord_grid_size
+        return round(round(value / grid) * grid, 6) + 0.0  # + 0.0 : pas de -0.0
+    
+    def _normalize_city(self, city: str) -> str:
+        """'Paris, FR ' -> 'paris,fr'"""
+        return ",".join(part.strip() for part in city.lower().split(","))
     
     def _generate_key(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> str:
-        """Génère une clé de cache unique"""
+        """Génère une clé de cache unique (coordonnées alignées sur la grille)"""
         if city:
-            return f"weather:city:{city.lower()}"
+            return f"weather:city:{self._normalize_city(city)}"
         elif lat is not None and lon is not None:
-            return f"weather:coords:{lat:.2f},{lon:.2f}"
+            return f"weather:coords:{self._snap(lat)},{self._snap(lon)}"
         raise ValueError("City ou coordonnées requises")
     
-    def get(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> Optional[dict]:
-        """Récupère les données du cache"""
+    def _series_key(self, key: str) -> str:
+        """Clé de la série de prévisions stockée à côté d'une entrée"""
+        return "forecast:" + key[len("weather:"):]
+    
+    def _cell_coords(self, key: str) -> Optional[Tuple[float, float]]:
+        """Coordonnées d'une clé de cellule, None pour une clé de ville"""
+        if not key.startswith("weather:coords:"):
+            return None
+        lat, lon = key[len("weather:coords:"):].split(",")
+        return float(lat), float(lon)
+    
+    async def resolve_key(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> str:
+        """Clé canonique d'une requête (voir resolve_keys)"""
+        return (await self.resolve_keys([(city, lat, lon)]))[0]
+    
+    async def resolve_keys(self, locations: List[Tuple[Optional[str], Optional[float], Optional[float]]]) -> List[str]:
+        """Clés canoniques : une ville déjà résolue partage la cellule de ses coordonnées"""
+        keys = [self._generate_key(*location) for location in locations]
+        city_indexes = [i for i, (city, _, _) in enumerate(locations) if city]
+        resolved = await self.get_coords_many([locations[i][0] for i in city_indexes])
+        for i, coords in zip(city_indexes, resolved):
+            if coords:
+                keys[i] = self._generate_key(None, *coords)
+        return keys
+    
+    async def get(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> Optional[dict]:
+        """Récupère les données du cache (L1 puis Redis)"""
+        entry = await self.get_raw(city, lat, lon)
+        return orjson.loads(entry.body) if entry else None
+    
+    async def get_raw(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> Optional[CachedPayload]:
+        """Récupère l'entrée sérialisée (corps JSON de la réponse, sans désérialisation)"""
         try:
-            key = self._generate_key(city, lat, lon)
-            data = self.client.get(key)
-            if data:
-                cached_data = json.loads(data)
-                cached_data['cached'] = True
-                cached_data['cache_expires_at'] = cached_data.get('cache_expires_at')
-                return cached_data
+            # Cellule voisine seulement pour une requête par coordonnées (la clé d'une ville suit la ville)
+            key = await self.resolve_key(city, lat, lon)
+            return await self.lookup(key) if city else await self.lookup(key, lat, lon)
+        except Exception as e:
+            logger.warning("Cache get error: %s", e)
+            return None
+    
+    async def lookup(self, key: str, lat: Optional[float] = None, lon: Optional[float] = None) -> Optional[CachedPayload]:
+        """
+        Récupère une entrée par clé ; avec lat/lon (requêtes par coordonnées),
+        se rabat sur la cellule en cache la plus proche.
+        
+        Une cellule servie par sa voisine garde en L1 un alias (la clé de la
+        voisine) : les requêtes suivantes sont servies sans Redis, et
+        l'invalidation de la voisine vaut aussi pour elles.
+        """
+        try:
+            if self.local is not None:
+                entry = self._get_local(key)
+                if entry is not None:
+                    self.stats['l1_hits'] += 1
+                    CACHE_REQUESTS.labels('l1', 'hit').inc()
+                    return entry
+                CACHE_REQUESTS.labels('l1', 'miss').inc()
+            
+            with REDIS_LATENCY.labels('get').time():
+                data = await self.client.get(key)
+            entry = self._load(key, data)
+            CACHE_REQUESTS.labels('l2', 'hit' if entry else 'miss').inc()
+            if entry is not None:
+                self.stats['l2_hits'] += 1
+                return entry
+            
+            if lat is not None and lon is not None and settings.nearest_radius_km > 0:
+                nearest = await self._nearest(lat, lon)
+                if nearest is not None:
+                    member, entry = nearest
+                    self._set_local(key, entry, alias=member)
+                    return entry
+            self.stats['misses'] += 1
             return None
         except Exception as e:
-            print(f"Cache get error: {e}")
+            CACHE_REQUESTS.labels('l2', 'error').inc()
+            logger.warning("Cache get error: %s", e)
+            return None
+    
+    async def _nearest(self, lat: float, lon: float) -> Optional[Tuple[str, CachedPayload]]:
+        """
+        Clé et entrée de la cellule en cache la plus proche dans le rayon configuré.
+        
+        Les cellules expirées (d'après l'index d'expiration) sont écartées
+        avant la lecture : elles ne masquent pas une cellule vivante plus loin.
+        """
+        with REDIS_LATENCY.labels('geosearch').time():
+            members = await self.client.geosearch(
+                CELLS_KEY,
+                longitude=lon,
+                latitude=lat,
+                radius=settings.nearest_radius_km,
+                unit="km",
+                sort="ASC",
+                count=NEAREST_SCAN
+            )
+        if members:
+            expiries = await self.client.zmscore(CELLS_EXPIRY_KEY, members)
+            now = time.time()
+            # Sans expiration connue (indexée avant l'index d'expiration) : candidate
+            live = [m for m, expiry in zip(members, expiries) if expiry is None or expiry > now][:NEAREST_CANDIDATES]
+            if live:
+                with REDIS_LATENCY.labels('mget').time():
+                    values = await self.client.mget(live)
+                for member, data in zip(live, values):
+                    if data:
+                        self.stats['nearest_hits'] += 1
+                        CACHE_REQUESTS.labels('nearest', 'hit').inc()
+                        member = member.decode()
+                        return member, self._load(member, data)
+                    await self._unindex_cells([member])  # Supprimée ou évincée
+        CACHE_REQUESTS.labels('nearest', 'miss').inc()
+        return None
+    
+    async def _unindex_cells(self, members: list):
+        """Retire des cellules de l'index géospatial et de l'index d'expiration"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrem(CELLS_KEY, *members)
+        pipe.zrem(CELLS_EXPIRY_KEY, *members)
+        await pipe.execute()
+    
+    async def prune_cells(self) -> int:
+        """Retire de l'index les cellules dont l'entrée Redis a expiré ; renvoie leur nombre"""
+        pruned = 0
+        while True:
+            expired = await self.client.zrangebyscore(CELLS_EXPIRY_KEY, "-inf", time.time(), start=0, num=CELLS_PRUNE_BATCH)
+            if not expired:
+                return pruned
+            await self._unindex_cells(expired)
+            pruned += len(expired)
+            if len(expired) < CELLS_PRUNE_BATCH:
+                return pruned
+    
+    async def _prune_cells_loop(self):
+        """Élagage périodique de l'index des cellules (idempotent : chaque worker peut le faire)"""
+        while True:
+            await asyncio.sleep(settings.cells_prune_interval * random.uniform(0.5, 1.5))
+            try:
+                pruned = await self.prune_cells()
+                if pruned:
+                    logger.info("Pruned %d expired cells from the nearest-cell index", pruned)
+            except Exception as e:
+                logger.warning("Cache prune error: %s", e)
+    
+    async def get_series(self, key: str) -> Optional[CachedSeries]:
+        """Série de prévisions brute d'une clé (L1 puis Redis), None si absente"""
+        series_key = self._series_key(key)
+        try:
+            if self.local is not None:
+                entry = self.local.get(series_key)
+                if entry is not None:
+                    CACHE_REQUESTS.labels('series_l1', 'hit').inc()
+                    return entry
+                CACHE_REQUESTS.labels('series_l1', 'miss').inc()
+            
+            with REDIS_LATENCY.labels('get_series').time():
+                data = await self.client.get(series_key)
+            CACHE_REQUESTS.labels('series_l2', 'hit' if data else 'miss').inc()
+            if not data:
+                return None
+            series, expires_at = unpack_series(data)
+            entry = CachedSeries(series, self._is_stale(expires_at), expires_at)
+            self._set_local(series_key, entry)
+            return entry
+        except Exception as e:
+            CACHE_REQUESTS.labels('series_l2', 'error').inc()
+            logger.warning("Cache get_series error: %s", e)
             return None
     
-    def set(self, data: dict, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
-        """Enregistre les données dans le cache"""
+    async def get_many(self, keys: List[str]) -> List[Optional[CachedPayload]]:
+        """Récupère plusieurs entrées (L1 puis un seul MGET Redis)"""
+        results: List[Optional[CachedPayload]] = [None] * len(keys)
+        remaining = []
+        for i, key in enumerate(keys):
+            entry = self._get_local(key) if self.local is not None else None
+            if entry is not None:
+                self.stats['l1_hits'] += 1
+                results[i] = entry
+            else:
+                remaining.append(i)
+        if self.local is not None:
+            CACHE_REQUESTS.labels('l1', 'hit').inc(len(keys) - len(remaining))
+            CACHE_REQUESTS.labels('l1', 'miss').inc(len(remaining))
+        
+        if remaining:
+            try:
+                with REDIS_LATENCY.labels('mget').time():
+                    values = await self.client.mget([keys[i] for i in remaining])
+            except Exception as e:
+                CACHE_REQUESTS.labels('l2', 'error').inc(len(remaining))
+                logger.warning("Cache mget error: %s", e)
+                return results
+            for i, data in zip(remaining, values):
+                try:
+                    results[i] = self._load(keys[i], data)
+                except Exception as e:
+                    CACHE_REQUESTS.labels('l2', 'error').inc()
+                    logger.warning("Cache get error: %s", e)
+                    continue
+                self.stats['l2_hits' if results[i] else 'misses'] += 1
+                CACHE_REQUESTS.labels('l2', 'hit' if results[i] else 'miss').inc()
+        return results
+    
+    def _load(self, key: str, data: Optional[bytes]) -> Optional[CachedPayload]:
+        """Décode une entrée lue dans Redis et la place dans le cache L1 (brièvement si périmée)"""
+        if not data:
+            return None
+        body, expires_at = decode_entry(data)
+        if self._is_stale(expires_at):
+            entry = CachedPayload.of(mark_stale(body), True, expires_at)
+        else:
+            entry = CachedPayload.of(body, False, expires_at)
+        self._set_local(key, entry)
+        return entry
+    
+    async def set(self, data: dict, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None,
+                  series: Optional[dict] = None):
+        """Enregistre les données dans le cache (TTL souple + fenêtre périmée), avec leur série brute"""
         try:
             key = self._generate_key(city, lat, lon)
-            expires_at = datetime.utcnow() + timedelta(seconds=settings.cache_ttl)
-            data['cache_expires_at'] = expires_at.isoformat()
-            self.client.setex(
+            expires_at = (datetime.utcnow() + timedelta(seconds=settings.cache_ttl)).isoformat()
+            with SERIALIZE_LATENCY.labels('encode').time():
+                body = encode_entry(data, expires_at)
+                stored = self._pack(data, expires_at, body)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.setex(
                 key,
-                settings.cache_ttl,
-                json.dumps(data, default=str)
+                settings.cache_ttl + settings.cache_stale_ttl,
+                stored
+            )
+            self._index_cell(pipe, key)
+            if series is not None:
+                self._set_series(pipe, key, series, expires_at)
+            with REDIS_LATENCY.labels('set').time():
+                await pipe.execute()
+            self._set_local(key, CachedPayload.of(body, False, expires_at))
+        except Exception as e:
+            REDIS_ERRORS.labels('set').inc()
+            logger.warning("Cache set error: %s", e)
+    
+    async def set_many(self, entries: List[Tuple[str, dict, Optional[dict]]]):
+        """Enregistre plusieurs entrées (clé, données, série brute) en un seul pipeline de SETEX"""
+        if not entries:
+            return
+        try:
+            expires_at = (datetime.utcnow() + timedelta(seconds=settings.cache_ttl)).isoformat()
+            pipe = self.client.pipeline(transaction=False)
+            for key, data, series in entries:
+                with SERIALIZE_LATENCY.labels('encode').time():
+                    body = encode_entry(data, expires_at)
+                    stored = self._pack(data, expires_at, body)
+                pipe.setex(key, settings.cache_ttl + settings.cache_stale_ttl, stored)
+                self._index_cell(pipe, key)
+                if series is not None:
+                    self._set_series(pipe, key, series, expires_at)
+                self._set_local(key, CachedPayload.of(body, False, expires_at))
+            with REDIS_LATENCY.labels('set_many').time():
+                await pipe.execute()
+        except Exception as e:
+            REDIS_ERRORS.labels('set_many').inc()
+            logger.warning("Cache set_many error: %s", e)
+    
+    async def set_coalesced(self, data: dict, lat: float, lon: float, series: Optional[dict] = None):
+        """
+        Comme set(), mais les écritures lancées dans le même tour de boucle
+        partent ensemble dans un seul pipeline (set_many).
+        
+        Chaque entrée est écrite dès qu'elle est prête, sans attendre la fin
+        d'un lot ; l'écriture tourne dans sa propre tâche, qu'un appelant
+        annulé n'interrompt pas.
+        """
+        self._pending_writes.append((self._generate_key(None, lat, lon), data, series))
+        if self._write_flush is None:
+            self._write_flush = asyncio.get_running_loop().create_task(self._flush_writes())
+        await asyncio.shield(self._write_flush)
+    
+    async def _flush_writes(self):
+        await asyncio.sleep(0)  # Laisse les entrées prêtes au même tour rejoindre le pipeline
+        entries, self._pending_writes = self._pending_writes, []
+        self._write_flush = None
+        await self.set_many(entries)
+    
+    def _pack(self, data: dict, expires_at: str, body: bytes) -> bytes:
+        """Octets stockés dans Redis, au format configuré (le corps JSON reste en L1)"""
+        return pack_entry(
+            data, expires_at, body,
+            settings.cache_format, settings.cache_compression, settings.cache_compression_level
+        )
+    
+    def _set_series(self, pipe, key: str, series: dict, expires_at: str):
+        """Ajoute l'écriture de la série brute d'une entrée au pipeline (même expiration)"""
+        series_key = self._series_key(key)
+        with SERIALIZE_LATENCY.labels('encode_series').time():
+            stored = pack_series(
+                series, expires_at,
+                settings.cache_format, settings.cache_compression, settings.cache_compression_level
+            )
+        pipe.setex(series_key, settings.cache_ttl + settings.cache_stale_ttl, stored)
+        self._set_local(series_key, CachedSeries(series, False, expires_at))
+    
+    def _index_cell(self, pipe, key: str):
+        """Ajoute une cellule à l'index géospatial (plus proche voisin), avec l'expiration de son entrée Redis"""
+        coords = self._cell_coords(key)
+        if coords and settings.nearest_radius_km > 0 and abs(coords[0]) <= 85.05:
+            pipe.geoadd(CELLS_KEY, (coords[1], coords[0], key))
+            pipe.zadd(CELLS_EXPIRY_KEY, {key: time.time() + settings.cache_ttl + settings.cache_stale_ttl})
+    
+    def _is_stale(self, expires_at: Optional[str]) -> bool:
+        """Vrai si l'entrée a dépassé son TTL souple"""
+        try:
+            return datetime.fromisoformat(expires_at) <= datetime.utcnow()
+        except (TypeError, ValueError):
+            return False
+    
+    async def soft_ttls(self, keys: List[str]) -> List[Optional[float]]:
+        """Secondes restantes avant le TTL souple de chaque clé (None si absente)"""
+        if not keys:
+            return []
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.pttl(key)
+            return [
+                pttl / 1000 - settings.cache_stale_ttl if pttl >= 0 else None
+                for pttl in await pipe.execute()
+            ]
+        except Exception as e:
+            logger.warning("Cache ttl error: %s", e)
+            return [None] * len(keys)
+    
+    def _get_local(self, key: str) -> Optional[CachedPayload]:
+        """Entrée L1 d'une clé, en suivant l'alias d'une cellule servie par sa voisine"""
+        entry = self.local.get(key)
+        if isinstance(entry, str):
+            entry = self.local.get(entry)
+        return entry
+    
+    def _set_local(self, key: str, entry: Union[CachedPayload, CachedSeries], alias: Optional[str] = None):
+        """
+        Enregistre une entrée dans le cache L1 (ou un alias vers la clé `alias`).
+        
+        Une entrée fraîche y reste jusqu'à son expiration ; une entrée périmée,
+        l1_stale_ttl secondes au plus (le rafraîchissement la remplace), sans
+        dépasser la fenêtre périmée de Redis.
+        """
+        if self.local is None:
+            return
+        try:
+            ttl = (datetime.fromisoformat(entry.expires_at) - datetime.utcnow()).total_seconds()
+        except ValueError:
+            return
+        if entry.stale:
+            ttl = min(ttl + settings.cache_stale_ttl, settings.l1_stale_ttl)
+        if settings.l1_cache_max_ttl > 0:
+            ttl = min(ttl, settings.l1_cache_max_ttl)
+        self.local.set(key, entry if alias is None else alias, ttl)
+    
+    async def get_coords(self, city: str) -> Optional[Tuple[float, float]]:
+        """Récupère les coordonnées résolues d'une ville"""
+        return (await self.get_coords_many([city]))[0]
+    
+    async def get_coords_many(self, cities: List[str]) -> List[Optional[Tuple[float, float]]]:
+        """Récupère les coordonnées résolues de plusieurs villes (un seul MGET)"""
+        if not cities:
+            return []
+        try:
+            with REDIS_LATENCY.labels('get_coords').time():
+                values = await self.client.mget([f"geo:city:{self._normalize_city(city)}" for city in cities])
+        except Exception as e:
+            REDIS_ERRORS.labels('get_coords').inc()
+            logger.warning("Cache get_coords error: %s", e)
+            return [None] * len(cities)
+        results = []
+        for data in values:
+            if data:
+                lat, lon = data.decode().split(",")
+                results.append((float(lat), float(lon)))
+            else:
+                results.append(None)
+        return results
+    
+    async def set_coords(self, city: str, lat: float, lon: float, overwrite: bool = True):
+        """Enregistre les coordonnées résolues d'une ville"""
+        try:
+            await self.client.set(
+                f"geo:city:{self._normalize_city(city)}",
+                f"{lat},{lon}",
+                ex=settings.geocode_ttl,
+                nx=not overwrite
             )
         except Exception as e:
-            print(f"Cache set error: {e}")
+            logger.warning("Cache set_coords error: %s", e)
     
-    def delete(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
+    async def delete(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
         """Supprime une entrée du cache"""
         try:
-            key = self._generate_key(city, lat, lon)
-            self.client.delete(key)
+            key = await self.resolve_key(city, lat, lon)
+            keys = (key, self._series_key(key))
+            if self.local is not None:
+                for k in keys:
+                    self.local.delete(k)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(*keys)
+            pipe.zrem(CELLS_KEY, key)
+            pipe.zrem(CELLS_EXPIRY_KEY, key)
+            if self.local is not None and settings.l1_invalidation_pubsub:
+                for k in keys:
+                    pipe.publish(INVALIDATION_CHANNEL, k)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning("Cache delete error: %s", e)
+    
+    async def start_invalidation_listener(self):
+        """Écoute les invalidations L1 publiées par les autres workers (tâche supervisée)"""
+        if self.local is None or not settings.l1_invalidation_pubsub or self._pubsub_task:
+            return
+        self._pubsub_task = asyncio.create_task(self._listen_invalidations())
+    
+    async def stop_invalidation_listener(self):
+        """Arrête l'écoute des invalidations L1"""
+        if self._pubsub_task:
+            self._pubsub_task.cancel()
+            await asyncio.gather(self._pubsub_task, return_exceptions=True)
+            self._pubsub_task = None
+    
+    async def _listen_invalidations(self):
+        """
+        Abonnement au canal d'invalidation, rétabli après chaque erreur.
+        
+        Reconnexion avec un backoff exponentiel (gigue complète) ; après une
+        coupure, le cache L1 est vidé : les invalidations publiées entre-temps
+        sont perdues.
+        """
+        failures = 0
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidate})
+                if failures:
+                    self.local.clear()
+                    logger.info("Cache pubsub resubscribed after %d failure(s), L1 cleared", failures)
+                    failures = 0
+                await pubsub.run()
+            except Exception as e:
+                logger.warning("Cache pubsub error: %s", e)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass  # Connexion déjà perdue
+            failures += 1
+            backoff = min(settings.l1_invalidation_backoff_max, settings.l1_invalidation_backoff * 2 ** (failures - 1))
+            await asyncio.sleep(random.uniform(0, backoff))
+    
+    def _on_invalidate(self, message: dict):
+        self.local.delete(message['data'].decode())
+    
+    def get_stats(self) -> dict:
+        """Compteurs et taux de hit L1/L2/cellule voisine (les taux L2 et voisine portent sur les miss L1)"""
+        l1_hits, l2_hits, nearest_hits = self.stats['l1_hits'], self.stats['l2_hits'], self.stats['nearest_hits']
+        l1_misses = l2_hits + nearest_hits + self.stats['misses']
+        lookups = l1_hits + l1_misses
+        return {
+            **self.stats,
+            'l1_hit_rate': round(l1_hits / lookups, 4) if lookups else 0.0,
+            'l2_hit_rate': round(l2_hits / l1_misses, 4) if l1_misses else 0.0,
+            'nearest_hit_rate': round(nearest_hits / l1_misses, 4) if l1_misses else 0.0,
+            'l1_size': len(self.local) if self.local is not None else 0
+        }
+    
+    async def acquire_lock(self, key: str, token: str, ttl_ms: int) -> bool:
+        """Prend un verrou court sur une clé (single-flight inter-workers)"""
+        try:
+            return bool(await self.client.set(f"lock:{key}", token, px=ttl_ms, nx=True))
         except Exception as e:
-            print(f"Cache delete error: {e}")
+            logger.warning("Cache lock error: %s", e)
+            return True  # Redis indisponible : on ne bloque pas la requête
     
-    def health_check(self) -> bool:
+    async def release_lock(self, key: str, token: str):
+        """Libère le verrou s'il appartient encore à l'appelant"""
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+        except Exception as e:
+            logger.warning("Cache unlock error: %s", e)
+    
+    async def lock_exists(self, key: str) -> bool:
+        """Vérifie si un verrou est posé sur une clé"""
+        try:
+            return bool(await self.client.exists(f"lock:{key}"))
+        except Exception:
+            return False
+    
+    async def health_check(self) -> bool:
         """Vérifie la connexion Redis"""
         try:
-            return self.client.ping()
+            return await self.client.ping()
         except:
             return False
 
+class SyncCacheService:
+    """
+    Interface synchrone pour les scripts : mêmes méthodes que CacheService,
+    exécutées sur une boucle d'événements dédiée (avec son propre pool).
+    """
+    
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._service = CacheService()
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+        
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self._loop.run_until_complete(attr(*args, **kwargs))
+        return call
+    
+    def close(self):
+        """Ferme le pool et la boucle"""
+        self._loop.run_until_complete(self._service.close())
+        self._loop.close()
+
 cache_service = CacheService()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import time
+from typing import Optional
+
+class CircuitOpenError(Exception):
+    """Upstream considered down: call not attempted"""
+
+class CircuitBreaker:
+    """
+    Per-worker circuit breaker.
+    
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds; then lets up to `half_open_calls` probes
+    through (half-open: two, so that the concurrent current + forecast pair
+    of a single request can go through together), closing again on success
+    or reopening on failure.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_calls: int = 2):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = 0
+        self.stats = {'opened': 0, 'rejected': 0}
+    
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not be attempted"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.stats['rejected'] += 1
+                raise CircuitOpenError("OpenWeather unavailable (circuit open)")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing >= self.half_open_calls:
+                self.stats['rejected'] += 1
+                raise CircuitOpenError("OpenWeather unavailable (circuit half-open)")
+            self._probing += 1
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = 0
+    
+    def record_failure(self):
+        self.failures += 1
+        self._probing = 0
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.stats['opened'] += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """Call ended without an upstream verdict (e.g. no rate-limit token)"""
+        if self.state == self.HALF_OPEN and self._probing:
+            self._probing -= 1
+    
+    def get_state(self) -> dict:
+        """State for /health"""
+        state = {'state': self.state, 'consecutive_failures': self.failures, **self.stats}
+        if self.state == self.OPEN:
+            state['retry_in'] = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return state
@@ -0,0 +1,104 @@
+import logging
+import heapq
+import mmap
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_INDEX = Path(__file__).resolve().parent.parent / "data" / "cities.tsv"
+
+def normalize(text: str) -> str:
+    """Search key: lowercase, accents stripped (São Paulo -> sao paulo)"""
+    decomposed = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+class CityIndex:
+    """
+    Offline city search for autocomplete.
+    
+    The data file holds one city per line, sorted by search key:
+        key \\t name \\t country \\t state \\t lat \\t lon \\t population
+    It is memory-mapped on first use (shared by all workers through the page
+    cache) and prefix lookups bisect over line offsets; matches are ranked by
+    population.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else BUNDLED_INDEX
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets: Optional[array] = None
+        self._unavailable = False
+    
+    def _load(self) -> bool:
+        """Maps the data file and indexes line offsets"""
+        if self._offsets is not None:
+            return True
+        if self._unavailable:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.warning("City index unavailable (%s): %s", self.path, e)
+            self._unavailable = True
+            return False
+        
+        offsets = array("I", [0])
+        size = len(mm)
+        pos = mm.find(b"\n")
+        while pos != -1 and pos + 1 < size:
+            offsets.append(pos + 1)
+            pos = mm.find(b"\n", pos + 1)
+        self._mm, self._offsets = mm, offsets
+        return True
+    
+    def _key_at(self, offset: int) -> bytes:
+        return self._mm[offset:self._mm.find(b"\t", offset)]
+    
+    def _line_at(self, offset: int) -> List[bytes]:
+        end = self._mm.find(b"\n", offset)
+        return self._mm[offset:end if end != -1 else len(self._mm)].split(b"\t")
+    
+    def _population_at(self, offset: int) -> int:
+        end = self._mm.find(b"\n", offset)
+        start = self._mm.rfind(b"\t", offset, end if end != -1 else len(self._mm))
+        return int(self._mm[start + 1:end if end != -1 else len(self._mm)])
+    
+    def search(self, query: str, limit: int = 5) -> List[dict]:
+        """Cities whose name starts with `query` ("name" or "name, country"), most populated first"""
+        name, _, country = query.partition(",")
+        return list(self._search(normalize(name), country.strip().upper(), limit))
+    
+    @lru_cache(maxsize=4096)
+    def _search(self, prefix: str, country: str, limit: int) -> Tuple[dict, ...]:
+        if not prefix or not self._load():
+            return ()
+        key = prefix.encode()
+        lo = bisect_left(self._offsets, key, key=self._key_at)
+        hi = bisect_left(self._offsets, key + b"\xff", lo=lo, key=self._key_at)
+        candidates = self._offsets[lo:hi]
+        if country:
+            candidates = [o for o in candidates if self._line_at(o)[2].decode() == country]
+        
+        results = []
+        for offset in heapq.nlargest(limit, candidates, key=self._population_at):
+            _, name, country_code, state, lat, lon, _ = self._line_at(offset)
+            results.append({
+                'name': name.decode(),
+                'country': country_code.decode(),
+                'state': state.decode(),
+                'lat': float(lat),
+                'lon': float(lon)
+            })
+        return tuple(results)
+    
+    def __len__(self) -> int:
+        return len(self._offsets) if self._load() else 0
+
+city_index = CityIndex(settings.city_index_path)
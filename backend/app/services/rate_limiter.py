@@ -0,0 +1,199 @@
+import logging
+import asyncio
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import List, Optional
+from app.config import settings
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # /api/weather and /api/search misses
+    BATCH = 1        # /api/weather/batch misses
+    BACKGROUND = 2   # Stale and refresh-ahead refreshes
+
+# Priority of the upstream calls made by the current task
+upstream_priority: ContextVar[Priority] = ContextVar("upstream_priority", default=Priority.INTERACTIVE)
+
+class SharedPriority:
+    """
+    Priority of an upstream call shared by several requests (coalesced
+    cache misses): starts at the first caller's priority and is raised
+    by RateLimiter.promote when a more urgent caller joins.
+    """
+    
+    __slots__ = ('priority',)
+    
+    def __init__(self, priority: Priority):
+        self.priority = priority
+
+# Shared priority of the call the current task is fetching for, if any (overrides a lower upstream_priority)
+upstream_shared_priority: ContextVar[Optional[SharedPriority]] = ContextVar("upstream_shared_priority", default=None)
+
+class RateLimitExceeded(Exception):
+    """Upstream call budget exhausted"""
+
+# Token bucket shared by all workers; counts granted calls per minute
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], 3600)
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return wait
+"""
+
+BUCKET_KEY = "ratelimit:openweather"
+USAGE_KEY = "ratelimit:openweather:usage:{minute}"
+
+class RateLimiter:
+    """
+    Quota-aware scheduler for OpenWeatherMap calls.
+    
+    Tokens come from a Redis token bucket shared across workers and
+    replicas. When the bucket is empty, callers queue by priority
+    (interactive before batch before background) and give up after the
+    maximum wait of their priority.
+    """
+    
+    def __init__(self):
+        self._waiters: List[list] = []
+        self._seq = itertools.count()
+        self._script = None
+        self.stats = {
+            priority.name.lower(): {'granted': 0, 'waited': 0, 'rejected': 0}
+            for priority in Priority
+        }
+    
+    def _max_wait(self, priority: Priority) -> float:
+        return {
+            Priority.INTERACTIVE: settings.rate_limit_max_wait_interactive,
+            Priority.BATCH: settings.rate_limit_max_wait_batch,
+            Priority.BACKGROUND: settings.rate_limit_max_wait_background
+        }[priority]
+    
+    async def _take(self) -> float:
+        """Takes a token; returns 0 if granted, else seconds until the next one"""
+        try:
+            client = cache_service.client
+            if self._script is None:
+                self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            now_ms = int(time.time() * 1000)
+            wait_ms = await self._script(
+                keys=[BUCKET_KEY, USAGE_KEY.format(minute=now_ms // 60000)],
+                args=[settings.openweather_calls_per_minute / 60000, settings.rate_limit_burst, now_ms],
+                client=client  # The worker's current client (the one registered may have been closed)
+            )
+            return wait_ms / 1000
+        except Exception as e:
+            logger.warning("Rate limiter error: %s", e)
+            return 0  # Redis unavailable: do not block upstream calls
+    
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Waits for an upstream call token, raises RateLimitExceeded after the maximum wait.
+        
+        Within a shared call, the request queues at the shared priority and
+        moves up if it is raised while waiting (the maximum wait stays the
+        one it entered the queue with).
+        """
+        if not settings.rate_limit_enabled:
+            return
+        shared = upstream_shared_priority.get()
+        if shared is not None:
+            priority = min(priority, shared.priority)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._max_wait(priority)
+        entry = [priority, next(self._seq), asyncio.Event(), shared]
+        heapq.heappush(self._waiters, entry)
+        waited = False
+        try:
+            while True:
+                if self._waiters[0] is entry:
+                    wait = await self._take()
+                    if wait == 0:
+                        stats = self.stats[entry[0].name.lower()]
+                        stats['granted'] += 1
+                        stats['waited'] += waited
+                        return
+                else:
+                    wait = None  # Until promoted to the head of the queue
+                
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.stats[entry[0].name.lower()]['rejected'] += 1
+                    raise RateLimitExceeded("OpenWeather call budget exhausted")
+                waited = True
+                entry[2].clear()
+                try:
+                    await asyncio.wait_for(entry[2].wait(), remaining if wait is None else min(wait, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            was_head = self._waiters[0] is entry
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            if self._waiters and was_head:
+                self._waiters[0][2].set()
+    
+    def promote(self, shared: SharedPriority, priority: Priority) -> bool:
+        """Raises a shared call to `priority` (token requests already queued included); False if not more urgent"""
+        if priority >= shared.priority:
+            return False
+        shared.priority = priority
+        head = self._waiters[0] if self._waiters else None
+        for entry in self._waiters:
+            if entry[3] is shared and entry[0] > priority:
+                entry[0] = priority
+        heapq.heapify(self._waiters)
+        if self._waiters and self._waiters[0] is not head:
+            self._waiters[0][2].set()  # New head: take a token now
+        return True
+    
+    async def try_acquire(self, priority: Priority = Priority.INTERACTIVE) -> bool:
+        """Takes a token only if one is available right now and nobody is queued"""
+        if not settings.rate_limit_enabled:
+            return True
+        if self._waiters or await self._take() != 0:
+            return False
+        self.stats[priority.name.lower()]['granted'] += 1
+        return True
+    
+    async def get_stats(self) -> dict:
+        """Per-priority counters and upstream calls over the last minutes (all workers)"""
+        usage = {}
+        try:
+            minute = int(time.time()) // 60
+            minutes = list(range(minute - settings.rate_limit_usage_minutes + 1, minute + 1))
+            counts = await cache_service.client.mget([USAGE_KEY.format(minute=m) for m in minutes])
+            usage = {
+                time.strftime("%Y-%m-%dT%H:%M", time.gmtime(m * 60)): int(count or 0)
+                for m, count in zip(minutes, counts)
+            }
+        except Exception as e:
+            logger.warning("Rate limiter stats error: %s", e)
+        return {
+            'enabled': settings.rate_limit_enabled,
+            'calls_per_minute': settings.openweather_calls_per_minute,
+            'queued': len(self._waiters),
+            'priorities': self.stats,
+            'usage_per_minute': usage
+        }
+
+rate_limiter = RateLimiter()
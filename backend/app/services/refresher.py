@@ -0,0 +1,113 @@
+import logging
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.singleflight import singleflight
+from app.services.rate_limiter import Priority, upstream_priority
+
+logger = logging.getLogger(__name__)
+
+Params = Tuple[Optional[str], Optional[float], Optional[float]]
+FetchFn = Callable[[Optional[str], Optional[float], Optional[float]], Awaitable[object]]
+
+class Refresher:
+    """
+    Background refresh of cached weather entries.
+    
+    Stale hits (between the soft and hard TTL) schedule a refresh of their
+    key. With `refresh_ahead_enabled`, a loop also re-fetches the top-N most
+    requested keys shortly before their soft expiry.
+    """
+    
+    def __init__(self):
+        self.fetch: Optional[FetchFn] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending: Set[str] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._requests: Counter = Counter()
+        self._params: Dict[str, Params] = {}
+        self.stats = {'stale_refreshes': 0, 'ahead_refreshes': 0, 'refresh_errors': 0}
+    
+    def track(self, key: str, city: Optional[str], lat: Optional[float], lon: Optional[float]):
+        """Counts a request for the key (top-N popularity), while refresh-ahead runs"""
+        if self._loop_task is None:
+            return
+        if key not in self._requests:
+            # Bounded: rather than keep every distinct location, forget the ones seen once (else decay)
+            while len(self._requests) >= max(1, settings.refresh_tracked_keys):
+                once = [tracked for tracked, count in self._requests.items() if count == 1]
+                if not once:
+                    self._decay()
+                for tracked in once:
+                    del self._requests[tracked]
+                    del self._params[tracked]
+        self._requests[key] += 1
+        self._params[key] = (city, lat, lon)
+    
+    def schedule(self, key: str, city: Optional[str], lat: Optional[float], lon: Optional[float], reason: str = 'stale_refreshes'):
+        """Refreshes the key in the background (coalesced with concurrent misses)"""
+        if self.fetch is None or key in self._pending:
+            return
+        self.stats[reason] += 1
+        self._pending.add(key)
+        task = asyncio.create_task(self._refresh(key, (city, lat, lon)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _refresh(self, key: str, params: Params):
+        upstream_priority.set(Priority.BACKGROUND)
+        try:
+            await singleflight.do(key, lambda: self.fetch(*params))
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.warning("Refresh error (%s): %s", key, e)
+        finally:
+            self._pending.discard(key)
+    
+    def start(self, fetch: FetchFn):
+        """Sets the fetch function and starts the refresh-ahead loop if enabled"""
+        self.fetch = fetch
+        if settings.refresh_ahead_enabled and self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._refresh_ahead_loop())
+    
+    async def stop(self):
+        """Stops the refresh-ahead loop and pending refreshes"""
+        tasks = list(self._tasks)
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _refresh_ahead_loop(self):
+        while True:
+            await asyncio.sleep(settings.refresh_interval)
+            try:
+                await self._refresh_ahead()
+            except Exception as e:
+                logger.warning("Refresh-ahead error: %s", e)
+    
+    async def _refresh_ahead(self):
+        """Refreshes the top-N keys whose soft TTL ends within `refresh_ahead_seconds`"""
+        top_keys = [key for key, _ in self._requests.most_common(settings.refresh_top_n)]
+        for key, ttl in zip(top_keys, await cache_service.soft_ttls(top_keys)):
+            if ttl is not None and ttl <= settings.refresh_ahead_seconds:
+                self.schedule(key, *self._params[key], reason='ahead_refreshes')
+        self._decay()
+    
+    def _decay(self):
+        """Halves request counts so popularity follows recent traffic, forgetting keys that reach 0"""
+        for key in list(self._requests):
+            self._requests[key] //= 2
+            if not self._requests[key]:
+                del self._requests[key]
+                del self._params[key]
+    
+    def get_stats(self) -> dict:
+        """Refresh counters"""
+        return {**self.stats, 'pending': len(self._tasks), 'tracked_keys': len(self._requests)}
+
+refresher = Refresher()
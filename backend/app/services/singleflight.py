@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.rate_limiter import rate_limiter, upstream_priority, upstream_shared_priority, SharedPriority
+
+class SingleFlight:
+    """
+    Coalesces concurrent cache misses on the same key.
+    
+    The first caller (leader) starts the fetch; concurrent callers in the
+    same process await its result. With `singleflight_distributed` enabled, the
+    leader also takes a short-lived Redis lock, and leaders in other workers
+    poll the cache until the lock holder has filled it.
+    
+    The call runs at the most urgent upstream priority among its callers:
+    an interactive request joining a batch or background refresh raises
+    it, rather than waiting behind the rate limiter queue.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, Tuple[asyncio.Task, SharedPriority]] = {}
+        self.stats = {
+            'leaders': 0,
+            'coalesced': 0,
+            'promoted': 0,
+            'remote_waits': 0,
+            'remote_hits': 0,
+            'remote_fallbacks': 0
+        }
+    
+    async def do(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        poll: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """
+        Returns `fetch()` for the key, sharing the in-flight call if any.
+        
+        The call runs in its own task, awaited through a shield by every
+        caller (the first one included): a caller that is cancelled (client
+        disconnect, shutdown) stops waiting without cancelling the call for
+        the others.
+        """
+        priority = upstream_priority.get()
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            task, shared = inflight
+            self.stats['coalesced'] += 1
+            if rate_limiter.promote(shared, priority):
+                self.stats['promoted'] += 1
+        else:
+            shared = SharedPriority(priority)
+            task = asyncio.get_running_loop().create_task(self._run(key, fetch, poll, shared))
+            task.add_done_callback(functools.partial(self._done, key))
+            self._inflight[key] = (task, shared)
+            self.stats['leaders'] += 1
+        return await asyncio.shield(task)
+    
+    def _done(self, key: str, task: asyncio.Task):
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved when every caller has gone
+    
+    async def stop(self):
+        """Cancels the calls still in flight (shutdown)"""
+        tasks = [task for task, _ in self._inflight.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _run(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        poll: Optional[Callable[[], Awaitable[Any]]],
+        shared: SharedPriority
+    ) -> Any:
+        """Runs the fetch, guarded by a Redis lock across workers if enabled"""
+        upstream_shared_priority.set(shared)  # Own context copy: upstream calls of this task only
+        if not settings.singleflight_distributed or poll is None:
+            return await fetch()
+        
+        token = uuid.uuid4().hex
+        if await cache_service.acquire_lock(key, token, settings.singleflight_lock_ttl):
+            try:
+                return await fetch()
+            finally:
+                await cache_service.release_lock(key, token)
+        
+        # Another worker is fetching: poll the cache until it is filled
+        self.stats['remote_waits'] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.singleflight_wait_timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.singleflight_poll_interval)
+            result = await poll()
+            if result is not None:
+                self.stats['remote_hits'] += 1
+                return result
+            if not await cache_service.lock_exists(key):
+                break
+        
+        # Lock holder failed or timed out: fetch ourselves
+        self.stats['remote_fallbacks'] += 1
+        return await fetch()
+    
+    def get_stats(self) -> dict:
+        """Coalescing counters"""
+        return {**self.stats, 'in_flight': len(self._inflight)}
+
+singleflight = SingleFlight()
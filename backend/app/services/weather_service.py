@@ -1,34 +1,211 @@
-import requests
-from typing import Optional
+import asyncio
+import random
+import time
+import httpx
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional, Tuple
 from datetime import datetime
 from app.config import settings
 from app.models import WeatherResponse, CurrentWeather, HourlyForecast, DailyForecast
-from app.utils.normalizer import normalize_weather_data
+from app.utils.normalizer import compact_forecast, forecast_view
+from app.services.rate_limiter import rate_limiter, upstream_priority, RateLimitExceeded
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.metrics import NORMALIZE_LATENCY, UPSTREAM_ERRORS, UPSTREAM_LATENCY, upstream_endpoint
 
 class WeatherService:
     def __init__(self):
         self.api_key = settings.openweather_api_key
         self.base_url = settings.openweather_base_url
+        self.geo_url = settings.openweather_geo_url
+        self.client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_timeout)
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+        self.stats = {'retries': 0, 'hedged': 0}
     
-    def get_weather(self, city: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None) -> WeatherResponse:
-        """Retrieves weather data from OpenWeatherMap"""
+    async def start(self):
+        """Opens the shared HTTP client (keep-alive connection pool)"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=settings.http2,
+                timeout=httpx.Timeout(
+                    settings.http_timeout,
+                    connect=settings.http_connect_timeout,
+                    read=settings.http_read_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry
+                )
+            )
+    
+    async def close(self):
+        """Closes the shared HTTP client"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    async def _get(self, url: str, params: dict) -> httpx.Response:
+        """
+        GET through the shared client, within the upstream call budget.
         
-        # Call API current weather
-        current_data = self._fetch_current_weather(city, lat, lon)
+        Connection errors, timeouts and 5xx are retried with jittered
+        exponential backoff; the outcome feeds the circuit breaker, which
+        fails fast while OpenWeatherMap is down.
+        """
+        self.breaker.before_call()
+        if self.client is None:
+            await self.start()
         
-        # Extract coordinates for subsequent calls
-        coords_lat = current_data['coord']['lat']
-        coords_lon = current_data['coord']['lon']
+        outcome = None
+        try:
+            for attempt in range(settings.http_retries + 1):
+                if attempt:
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(random.uniform(0, settings.http_retry_backoff * 2 ** (attempt - 1)))
+                await rate_limiter.acquire(upstream_priority.get())
+                try:
+                    response = await self._send(url, params)
+                except httpx.TransportError:
+                    if attempt == settings.http_retries:
+                        outcome = 'failure'
+                        raise
+                    continue
+                
+                if response.status_code < 500 or attempt == settings.http_retries:
+                    outcome = 'failure' if response.status_code >= 500 else 'success'
+                    if response.status_code == 429:
+                        raise RateLimitExceeded("OpenWeather rate limit reached")
+                    return response
+        finally:
+            if outcome == 'success':
+                self.breaker.record_success()
+            elif outcome == 'failure':
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+    
+    async def _send(self, url: str, params: dict) -> httpx.Response:
+        """Single upstream GET, hedged if enabled; records its latency"""
+        endpoint = upstream_endpoint(url)
+        delay = self._hedge_delay(endpoint) if settings.hedge_enabled else None
+        start = time.perf_counter()
+        try:
+            if delay is None:
+                response = await self.client.get(url, params=params)
+            else:
+                response = await self._hedged(url, params, delay)
+        except httpx.TransportError as e:
+            UPSTREAM_ERRORS.labels(endpoint, type(e).__name__).inc()
+            raise
+        elapsed = time.perf_counter() - start
+        self._latencies[endpoint].append(elapsed)
+        UPSTREAM_LATENCY.labels(endpoint).observe(elapsed)
+        if response.status_code >= 500 or response.status_code == 429:
+            UPSTREAM_ERRORS.labels(endpoint, str(response.status_code)).inc()
+        return response
+    
+    def _hedge_delay(self, endpoint: str) -> Optional[float]:
+        """p95 latency of the endpoint, once enough samples are known"""
+        samples = self._latencies[endpoint]
+        if len(samples) < 20:
+            return None
+        return max(settings.hedge_min_delay, sorted(samples)[int(len(samples) * 0.95)])
+    
+    async def _hedged(self, url: str, params: dict, delay: float) -> httpx.Response:
+        """Sends a second identical GET if the first is still pending after `delay`; first success wins"""
+        tasks = [asyncio.ensure_future(self.client.get(url, params=params))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not await rate_limiter.try_acquire(upstream_priority.get()):
+                return await tasks[0]
+            
+            self.stats['hedged'] += 1
+            tasks.append(asyncio.ensure_future(self.client.get(url, params=params)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return tasks[0].result()  # Both failed: raise the first error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def get_stats(self) -> dict:
+        """Circuit breaker, retries, hedging and recent p95 latency per endpoint"""
+        return {
+            'breaker': self.breaker.get_state(),
+            **self.stats,
+            'p95_ms': {
+                endpoint: round(sorted(samples)[int(len(samples) * 0.95)] * 1000, 1)
+                for endpoint, samples in self._latencies.items() if samples
+            }
+        }
+    
+    async def get_weather(
+        self,
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        coords: Optional[Tuple[float, float]] = None
+    ) -> WeatherResponse:
+        """Retrieves weather data from OpenWeatherMap (standard response view)"""
+        series = await self.get_forecast(city=city, lat=lat, lon=lon, coords=coords)
+        return WeatherResponse(**forecast_view(series))
+    
+    async def get_forecast(
+        self,
+        city: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        coords: Optional[Tuple[float, float]] = None
+    ) -> dict:
+        """
+        Retrieves current weather and the 5-day forecast from OpenWeatherMap,
+        as a compact series (see normalizer.compact_forecast).
         
-        # Call API forecast (hourly + daily)
-        forecast_data = self._fetch_forecast(coords_lat, coords_lon)
+        When the coordinates are known (lat/lon given, or `coords` resolved
+        from the geocode cache), current weather and forecast are fetched
+        concurrently, both by those coordinates (the same place, even if the
+        cache was fed by another geocoder than /weather's); otherwise the
+        forecast waits for `coord` from /weather.
+        """
+        if lat is not None and lon is not None:
+            coords = (lat, lon)
         
-        # Normalize data
-        normalized = normalize_weather_data(current_data, forecast_data)
+        if coords:
+            current_data, forecast_data = await self._gather(
+                self._fetch_current_weather(None, *coords),
+                self._fetch_forecast(*coords)
+            )
+        else:
+            # Call API current weather
+            current_data = await self._fetch_current_weather(city, lat, lon)
+            
+            # Extract coordinates for subsequent calls
+            coords_lat = current_data['coord']['lat']
+            coords_lon = current_data['coord']['lon']
+            
+            # Call API forecast (hourly + daily)
+            forecast_data = await self._fetch_forecast(coords_lat, coords_lon)
         
-        return WeatherResponse(**normalized)
+        # Compact series (response views are derived from it)
+        with NORMALIZE_LATENCY.time():
+            return compact_forecast(current_data, forecast_data)
+    
+    async def _gather(self, *coros):
+        """Runs the upstream calls concurrently, cancelling the rest on first failure"""
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
     
-    def _fetch_current_weather(self, city: Optional[str], lat: Optional[float], lon: Optional[float]) -> dict:
+    async def _fetch_current_weather(self, city: Optional[str], lat: Optional[float], lon: Optional[float]) -> dict:
         """Call API for current weather"""
         params = {
             'appid': self.api_key,
@@ -45,7 +222,7 @@ class WeatherService:
             raise ValueError("City or coordinates required")
         
         url = f"{self.base_url}/weather"
-        response = requests.get(url, params=params, timeout=5)
+        response = await self._get(url, params)
         
         if response.status_code == 404:
             raise ValueError(f"City '{city}' not found")
@@ -54,7 +231,7 @@ class WeatherService:
         
         return response.json()
     
-    def _fetch_forecast(self, lat: float, lon: float) -> dict:
+    async def _fetch_forecast(self, lat: float, lon: float) -> dict:
         """Call API for hourly and daily forecasts"""
         params = {
             'lat': lat,
@@ -62,18 +239,18 @@ class WeatherService:
             'appid': self.api_key,
             'units': 'metric',
             'lang': 'en',
-            'cnt': 40  # 5 days of forecasts (we will keep 3)
+            'cnt': 40  # 5 days of forecasts (stored whole, views keep 12 hours / 3 days by default)
         }
         
         url = f"{self.base_url}/forecast"
-        response = requests.get(url, params=params, timeout=5)
+        response = await self._get(url, params)
         
         if response.status_code != 200:
             raise Exception(f"Forecast API error: {response.status_code}")
         
         return response.json()
     
-    def search_city(self, query: str, limit: int = 5) -> list:
+    async def search_city(self, query: str, limit: int = 5) -> list:
         """City search for autocomplete"""
         params = {
             'q': query,
@@ -81,8 +258,11 @@ class WeatherService:
             'appid': self.api_key
         }
         
-        url = "http://api.openweathermap.org/geo/1.0/direct"
-        response = requests.get(url, params=params, timeout=5)
+        url = f"{self.geo_url}/direct"
+        try:
+            response = await self._get(url, params)
+        except (RateLimitExceeded, CircuitOpenError):
+            return []
         
         if response.status_code != 200:
             return []
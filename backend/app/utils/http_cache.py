@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only without the brotli package
+    brotli = None
+
+# Encodings we can produce, in order of preference on equal q-values
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def etag(payload: bytes) -> str:
+    """Strong validator of a response body (or of what a derived view depends on)"""
+    return '"%s"' % hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+@lru_cache(maxsize=4096)
+def _entry_times(expires_at: str) -> Optional[Tuple[float, datetime, str]]:
+    """(soft expiry epoch, write time, Last-Modified value) of a cache entry, computed once per entry"""
+    try:
+        expires = datetime.fromisoformat(expires_at).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    # Written CACHE_TTL before its soft expiry
+    modified = (expires - timedelta(seconds=settings.cache_ttl)).replace(microsecond=0)
+    return expires.timestamp(), modified, format_datetime(modified, usegmt=True)
+
+def cache_headers(tag: str, expires_at: str, stale: bool) -> Dict[str, str]:
+    """
+    ETag, Last-Modified and Cache-Control of a cached response: max-age is
+    the remaining soft TTL, stale-while-revalidate what is left of the stale
+    window after it (the entry's hard expiry)
+    """
+    times = _entry_times(expires_at)
+    if times is None:
+        max_age, swr = 0, settings.cache_stale_ttl
+    else:
+        now = time.time()
+        max_age = 0 if stale else max(0, int(times[0] - now))
+        swr = max(0, int(times[0] + settings.cache_stale_ttl - now) - max_age)
+    headers = {
+        'ETag': tag,
+        'Cache-Control': f"public, max-age={max_age}, stale-while-revalidate={swr}"
+    }
+    if times is not None:
+        headers['Last-Modified'] = times[2]
+    if settings.response_compression:
+        headers['Vary'] = 'Accept-Encoding'
+    return headers
+
+def _base(tag: str) -> str:
+    """'"<hash>-gzip"' -> '"<hash>"'"""
+    return tag.split('-', 1)[0] + '"' if '-' in tag else tag
+
+def not_modified(request: Request, tag: str, expires_at: str) -> bool:
+    """True if the client's copy is current (If-None-Match, else If-Modified-Since)"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        # Any representation of the entry matches (identity or compressed)
+        return any(_base(candidate.strip().removeprefix('W/')) == tag for candidate in if_none_match.split(','))
+    if_modified_since = request.headers.get('if-modified-since')
+    times = _entry_times(expires_at)
+    if if_modified_since is None or times is None:
+        return False
+    try:
+        return times[1] <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred encoding the client accepts (br, then gzip), None for identity"""
+    if not accept_encoding or not settings.response_compression:
+        return None
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Body in the negotiated encoding (gzip with a fixed mtime, so the bytes are reproducible)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.response_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0)
+
+def respond(request: Request, body: Union[bytes, Callable[[], bytes]], tag: str, expires_at: str, stale: bool,
+            encoded: Optional[Dict[str, bytes]] = None) -> Response:
+    """
+    JSON response of a cached body with its validators: 304 if the client's
+    copy is current, else the body, compressed if negotiated.
+    
+    `body` may be a callable, only called when a body is sent (derived
+    views, always compressed if negotiated). Compressed bytes are kept in `encoded` (the cache entry's) for
+    the next hits; each encoding gets its own ETag ("<hash>-gzip").
+    """
+    # Representation first, so a 304 carries the ETag the 200 would have. A lazy
+    # body's size is unknown before it is derived: compressed whenever negotiated
+    encoding = negotiate(request.headers.get('accept-encoding'))
+    if encoding is not None and not callable(body) and len(body) < settings.response_compression_min_size:
+        encoding = None
+    headers = cache_headers(tag if encoding is None else f'{tag[:-1]}-{encoding}"', expires_at, stale)
+    if not_modified(request, tag, expires_at):
+        return Response(status_code=304, headers=headers)
+    
+    if callable(body):
+        body = body()
+    if encoding is not None:
+        compressed = encoded.get(encoding) if encoded is not None else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if encoded is not None:
+                encoded[encoding] = compressed
+        body = compressed
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,72 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+from datetime import datetime, timezone
+
+import orjson
+
+# Standard LogRecord attributes; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+# Renders tracebacks in the QueueHandler, before the record crosses threads
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg + `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        entry.update((k, v) for k, v in record.__dict__.items() if k not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message.
+
+    The stock prepare() formats the record (traceback included) into `msg`
+    and drops exc_info; here the traceback is rendered into exc_text only,
+    so JsonFormatter can still emit it as `exc`.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+def setup_logging(level: str = "INFO", json: bool = True):
+    """
+    Configures the `app` logger.
+
+    Records are handed to a queue and written by a background thread, so
+    logging never blocks the event loop on stdout.
+    """
+    logger = logging.getLogger("app")
+    if logger.handlers:
+        return
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        JsonFormatter() if json else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(_QueueHandler(records))
+    logger.setLevel(level.upper())
+    logger.propagate = False
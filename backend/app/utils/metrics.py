@@ -0,0 +1,93 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Sub-millisecond buckets: L1/Redis hits are well under 1ms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'weather_request_duration_seconds', 'HTTP request latency',
+    ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+REDIS_LATENCY = Histogram(
+    'weather_redis_duration_seconds', 'Redis call latency',
+    ['op'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_LATENCY = Histogram(
+    'weather_upstream_duration_seconds', 'OpenWeatherMap call latency',
+    ['endpoint'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_ERRORS = Counter(
+    'weather_upstream_errors_total', 'Failed OpenWeatherMap calls',
+    ['endpoint', 'reason']
+)
+NORMALIZE_LATENCY = Histogram(
+    'weather_normalize_duration_seconds', 'Normalization of upstream payloads',
+    buckets=LATENCY_BUCKETS
+)
+SERIALIZE_LATENCY = Histogram(
+    'weather_serialize_duration_seconds', 'Serialization of responses for the cache',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'weather_cache_requests_total', 'Cache lookups per tier (l1, l2, nearest) and result (hit, miss, error)',
+    ['tier', 'result']
+)
+REDIS_ERRORS = Counter(
+    'weather_redis_errors_total', 'Failed Redis calls',
+    ['op']
+)
+STARTUP_DURATION = Histogram(
+    'weather_startup_duration_seconds', 'Worker boot time per phase (import, startup, warmup)',
+    ['phase'], buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+def upstream_endpoint(url: str) -> str:
+    """'.../data/2.5/forecast' -> 'forecast', '.../geo/1.0/direct' -> 'geo'"""
+    endpoint = url.rsplit('/', 1)[-1]
+    return 'geo' if endpoint == 'direct' else endpoint
+
+def render() -> bytes:
+    """Exposition text, aggregated across workers in multiprocess mode"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+class MetricsMiddleware:
+    """
+    Records REQUEST_LATENCY for every HTTP request.
+
+    Plain ASGI (no BaseHTTPMiddleware) to keep the per-request cost to a
+    clock read and one histogram observation. Requests are labelled by
+    endpoint function name, so path parameters cannot blow up cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            endpoint = scope.get('endpoint')
+            REQUEST_LATENCY.labels(
+                endpoint.__name__ if endpoint else 'unmatched', scope['method'], str(status)
+            ).observe(time.perf_counter() - start)
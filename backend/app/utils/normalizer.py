@@ -1,36 +1,37 @@
-from datetime import datetime
-from typing import Dict, List
+import time
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+EPOCH = date(1970, 1, 1)
+
+# Wind speed factor from the upstream m/s, per unit system
+WIND_FACTORS = {'metric': 3.6, 'imperial': 2.236936, 'standard': 1.0}  # km/h, mph, m/s
 
 def normalize_weather_data(current_data: dict, forecast_data: dict) -> dict:
     """Normalize OpenWeatherMap data into our standardized format"""
+    return forecast_view(compact_forecast(current_data, forecast_data))
+
+def compact_forecast(current_data: dict, forecast_data: dict) -> dict:
+    """
+    Compact time series of one upstream fetch (current weather + 5-day forecast).
     
-    # Extract current weather data
-    current = {
-        'temperature': round(current_data['main']['temp'], 1),
-        'feels_like': round(current_data['main']['feels_like'], 1),
-        'condition': current_data['weather'][0]['main'],
-        'condition_description': current_data['weather'][0]['description'].capitalize(),
-        'icon': current_data['weather'][0]['icon'],
-        'humidity': current_data['main']['humidity'],
-        'wind_speed': round(current_data['wind']['speed'] * 3.6, 1),  # m/s -> km/h
-        'precipitation_probability': 0,  # Not available in current weather
-        'timestamp': datetime.utcnow()
-    }
-    
-    # Hourly forecasts (next 12 hours)
-    hourly = []
-    for item in forecast_data['list'][:12]:
-        hourly.append({
-            'time': datetime.fromtimestamp(item['dt']),
-            'temperature': round(item['main']['temp'], 1),
-            'condition': item['weather'][0]['main'],
-            'icon': item['weather'][0]['icon'],
-            'precipitation_probability': int(item.get('pop', 0) * 100),
-            'wind_speed': round(item['wind']['speed'] * 3.6, 1)
-        })
-    
-    # Daily forecasts (3 days)
-    daily = _aggregate_daily_forecasts(forecast_data['list'][:24])
+    One column per field over the 3-hour slots, conditions dictionary-encoded,
+    values as sent by OpenWeatherMap (metric): every response view is derived
+    from it by forecast_view.
+    """
+    weather = current_data['weather'][0]
+    conditions: Dict[Tuple[str, str], int] = {}
+    dt, temp, humidity, pop, wind, condition = [], [], [], [], [], []
+    for item in forecast_data['list']:
+        main, item_weather = item['main'], item['weather'][0]
+        pair = (item_weather['main'], item_weather['icon'])
+        dt.append(item['dt'])
+        temp.append(main['temp'])
+        humidity.append(main['humidity'])
+        pop.append(item.get('pop', 0))
+        wind.append(item['wind']['speed'])
+        condition.append(conditions.setdefault(pair, len(conditions)))
     
     return {
         'city': current_data['name'],
@@ -38,52 +39,144 @@ def normalize_weather_data(current_data: dict, forecast_data: dict) -> dict:
         'latitude': current_data['coord']['lat'],
         'longitude': current_data['coord']['lon'],
         'timezone': forecast_data['city']['timezone'],
-        'current': current,
+        'fetched_at': datetime.utcnow().isoformat(),
+        'current': {
+            'temp': current_data['main']['temp'],
+            'feels_like': current_data['main']['feels_like'],
+            'condition': weather['main'],
+            'description': weather['description'],
+            'icon': weather['icon'],
+            'humidity': current_data['main']['humidity'],
+            'wind': current_data['wind']['speed']
+        },
+        'conditions': list(conditions),
+        'dt': dt,
+        'temp': temp,
+        'humidity': humidity,
+        'pop': pop,
+        'wind': wind,
+        'condition': condition
+    }
+
+def _temperature(celsius: float, units: str) -> float:
+    """Rounded temperature in the requested unit system (°C, °F or K)"""
+    if units == 'imperial':
+        return round(celsius * 1.8 + 32, 1)
+    if units == 'standard':
+        return round(celsius + 273.15, 1)
+    return round(celsius, 1)
+
+def forecast_view(series: dict, hours: int = 12, days: int = 3, units: str = 'metric', tz: str = 'server') -> dict:
+    """
+    Response fields (WeatherResponse) derived from a compact series.
+    
+    - **hours**: number of 3-hour forecast items
+    - **days**: number of daily items
+    - **units**: metric (°C, km/h), imperial (°F, mph) or standard (K, m/s)
+    - **tz**: times and day boundaries in the server timezone, the location's
+      (UTC offset reported at fetch time) or UTC
+    
+    The defaults give the standard response.
+    """
+    wind_factor = WIND_FACTORS[units]
+    current = series['current']
+    timestamps = series['dt']
+    if tz == 'server':
+        offset = _server_offset(timestamps, hours, days)
+    else:
+        offset = series['timezone'] if tz == 'location' else 0
+    
+    temps, pops, winds, condition = series['temp'], series['pop'], series['wind'], series['condition']
+    conditions = series['conditions']
+    hourly = []
+    for i, ts in enumerate(timestamps[:hours]):
+        name, icon = conditions[condition[i]]
+        hourly.append({
+            'time': datetime.fromtimestamp(ts) if offset is None else datetime.utcfromtimestamp(ts + offset),
+            'temperature': _temperature(temps[i], units),
+            'condition': name,
+            'icon': icon,
+            'precipitation_probability': int(pops[i] * 100),
+            'wind_speed': round(winds[i] * wind_factor, 1)
+        })
+    
+    return {
+        'city': series['city'],
+        'country': series['country'],
+        'latitude': series['latitude'],
+        'longitude': series['longitude'],
+        'timezone': series['timezone'],
+        'current': {
+            'temperature': _temperature(current['temp'], units),
+            'feels_like': _temperature(current['feels_like'], units),
+            'condition': current['condition'],
+            'condition_description': current['description'].capitalize(),
+            'icon': current['icon'],
+            'humidity': current['humidity'],
+            'wind_speed': round(current['wind'] * wind_factor, 1),
+            'precipitation_probability': 0,  # Not available in current weather
+            'timestamp': datetime.fromisoformat(series['fetched_at'])
+        },
         'hourly': hourly,
-        'daily': daily[:3],
+        'daily': _aggregate_daily_forecasts(series, _local_days(timestamps, offset, days), days, units),
         'cached': False
     }
 
-def _aggregate_daily_forecasts(forecast_list: List[dict]) -> List[dict]:
-    """Aggregate 3-hour forecasts into daily forecasts"""
-    daily_data = {}
+def _server_offset(timestamps: Sequence[int], hours: int, days: int) -> Optional[int]:
+    """
+    UTC offset (seconds) of the server timezone over the slots a view reads
+    (hourly items and first `days` local days), None if it changes among them (DST)
+    """
+    if not timestamps:
+        return 0
+    offset = time.localtime(timestamps[0]).tm_gmtoff
+    # Also checks the first slot past the days: a change there could move it back into the last day
+    last = min(len(timestamps), max(hours, _day_range(timestamps, offset, days) + 1)) - 1
+    return offset if time.localtime(timestamps[last]).tm_gmtoff == offset else None
+
+def _day_range(timestamps: Sequence[int], offset: int, days: int) -> int:
+    """Number of leading slots within the first `days` local days (fixed UTC offset)"""
+    if not timestamps:
+        return 0
+    end = ((timestamps[0] + offset) // 86400 + days) * 86400 - offset
+    return bisect_left(timestamps, end)
+
+def _local_days(timestamps: Sequence[int], offset: Optional[int], days: int) -> List[int]:
+    """
+    Local calendar day (days since epoch) of the slots the daily view reads:
+    the first `days` local days at a fixed UTC offset, every slot in the
+    server timezone across a DST change (offset None)
+    """
+    if offset is None:
+        return [(datetime.fromtimestamp(ts).date() - EPOCH).days for ts in timestamps]
+    return [(ts + offset) // 86400 for ts in timestamps[:_day_range(timestamps, offset, days)]]
+
+def _dominant(values: List[str]) -> str:
+    """Most frequent value (earliest first on ties); a day has at most 9 slots, list.count beats a dict"""
+    return max(values, key=values.count)
+
+def _aggregate_daily_forecasts(series: dict, days: Sequence[int], limit: int = 3, units: str = 'metric') -> List[dict]:
+    """Aggregate the 3-hour slots of a series into daily forecasts (first `limit` local days)"""
+    temps, pops, humidities, condition = series['temp'], series['pop'], series['humidity'], series['condition']
+    conditions = series['conditions']
     
-    for item in forecast_list:
-        dt = datetime.fromtimestamp(item['dt'])
-        date_key = dt.date()
-        
-        if date_key not in daily_data:
-            daily_data[date_key] = {
-                'temps': [],
-                'conditions': [],
-                'icons': [],
-                'precip_probs': [],
-                'humidity': []
-            }
-        
-        daily_data[date_key]['temps'].append(item['main']['temp'])
-        daily_data[date_key]['conditions'].append(item['weather'][0]['main'])
-        daily_data[date_key]['icons'].append(item['weather'][0]['icon'])
-        daily_data[date_key]['precip_probs'].append(item.get('pop', 0) * 100)
-        daily_data[date_key]['humidity'].append(item['main']['humidity'])
+    # Slots of a day are contiguous (ascending timestamps): each day is a slice of the columns
+    starts = [i for i in range(len(days)) if i == 0 or days[i] != days[i - 1]][:limit + 1]
+    ends = starts[1:] + [len(days)]
     
-    # Transform into a list of daily forecasts
     daily_forecasts = []
-    for date, data in sorted(daily_data.items())[:3]:
-        # Dominant condition (most frequent)
-        most_common_condition = max(set(data['conditions']), key=data['conditions'].count)
-        # Corresponding icon (take the one at noon if possible)
-        mid_idx = len(data['icons']) // 2
-        icon = data['icons'][mid_idx] if data['icons'] else '01d'
-        
+    for start, end in zip(starts[:limit], ends):
+        day_conditions = condition[start:end]
         daily_forecasts.append({
-            'date': datetime.combine(date, datetime.min.time()),
-            'temp_min': round(min(data['temps']), 1),
-            'temp_max': round(max(data['temps']), 1),
-            'condition': most_common_condition,
-            'icon': icon,
-            'precipitation_probability': int(max(data['precip_probs'])),
-            'humidity': int(sum(data['humidity']) / len(data['humidity']))
+            'date': datetime.utcfromtimestamp(days[start] * 86400),
+            'temp_min': _temperature(min(temps[start:end]), units),
+            'temp_max': _temperature(max(temps[start:end]), units),
+            # Dominant condition (most frequent)
+            'condition': _dominant([conditions[c][0] for c in day_conditions]),
+            # Corresponding icon (middle of the day)
+            'icon': conditions[day_conditions[len(day_conditions) // 2]][1],
+            'precipitation_probability': int(max(pops[start:end]) * 100),
+            'humidity': int(sum(humidities[start:end]) / (end - start))
         })
     
-    return daily_forecasts
\ No newline at end of file
+    return daily_forecasts
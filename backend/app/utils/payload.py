@@ -0,0 +1,156 @@
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Tuple
+
+import msgpack
+import orjson
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for CACHE_COMPRESSION=zstd
+    zstandard = None
+
+# Cache entries are stored as the canonical JSON body of the response, with the
+# cache fields always last so they can be patched without parsing the payload:
+#   {...,"cached":true,"stale":false,"cache_expires_at":"<iso>"}
+CACHE_FIELDS = ('cached', 'stale', 'cache_expires_at')
+TAIL_PREFIX = b',"cached":true,"stale":false,"cache_expires_at":"'
+FRESH_MARKER = b'"stale":false'
+STALE_MARKER = b'"stale":true'
+
+# Compact entries (CACHE_FORMAT / CACHE_COMPRESSION): a 4-byte header, then the
+# (compressed) payload. 0xFF never starts a JSON document, so both kinds of
+# entries can live side by side in Redis.
+#   0xFF | version | serializer | compression | payload
+MAGIC = 0xFF
+FORMAT_VERSION = 1
+SERIALIZERS = {'json': 0, 'msgpack': 1}
+COMPRESSIONS = {'none': 0, 'zlib': 1, 'zstd': 2}
+
+# Forecast series (see normalizer.compact_forecast) always use the compact
+# header, with this serializer code added to the entry serializer code
+SERIES_FLAG = 0x10
+
+# Datetime fields stored as epoch seconds instead of ISO strings in msgpack entries
+DATETIME_FIELDS = frozenset(('timestamp', 'time', 'date', 'cache_expires_at'))
+
+def encode_entry(data: dict, expires_at: str) -> bytes:
+    """Serialize a response dict (model_dump mode='json') into a cache entry"""
+    core = {k: v for k, v in data.items() if k not in CACHE_FIELDS}
+    body = orjson.dumps(core)
+    return body[:-1] + TAIL_PREFIX + expires_at.encode() + b'"}'
+
+def decode_entry(raw: bytes) -> Tuple[bytes, str]:
+    """Return (response body, cache_expires_at) of a cache entry (any format)"""
+    if raw[:1] == b'\xff':
+        return _unpack_entry(raw)
+    idx = raw.rfind(TAIL_PREFIX)
+    if idx == -1 or not raw.endswith(b'"}'):
+        # Entry written before the canonical format: re-encode it once
+        data = orjson.loads(raw)
+        expires_at = data.get('cache_expires_at') or ''
+        return encode_entry(data, expires_at), expires_at
+    return raw, raw[idx + len(TAIL_PREFIX):-2].decode()
+
+def mark_stale(body: bytes) -> bytes:
+    """Flip the `stale` flag of an encoded entry"""
+    idx = body.rfind(FRESH_MARKER)
+    return body[:idx] + STALE_MARKER + body[idx + len(FRESH_MARKER):]
+
+def _compress(payload: bytes, compression: str, level: int) -> bytes:
+    if compression == 'zlib':
+        return zlib.compress(payload, level)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("CACHE_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(payload)
+    return payload
+
+def _decompress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSIONS['zlib']:
+        return zlib.decompress(payload)
+    if compression == COMPRESSIONS['zstd']:
+        if zstandard is None:
+            raise RuntimeError("zstd cache entry but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+def _to_epoch(value: Any, key: str = '') -> Any:
+    """Whole-second naive ISO strings of DATETIME_FIELDS -> epoch ints (UTC)"""
+    if isinstance(value, dict):
+        return {k: _to_epoch(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_epoch(v) for v in value]
+    if key in DATETIME_FIELDS and isinstance(value, str):
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if dt.tzinfo is None and dt.isoformat() == value and not dt.microsecond:
+            return int(dt.replace(tzinfo=timezone.utc).timestamp())
+    return value
+
+@lru_cache(maxsize=4096)
+def _iso(epoch: int) -> str:
+    """Epoch int -> naive ISO string (forecast times repeat across entries)"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+def _from_epoch(obj: dict) -> dict:
+    """msgpack object_hook: inverse of _to_epoch"""
+    for key in DATETIME_FIELDS:
+        value = obj.get(key)
+        if type(value) is int:
+            obj[key] = _iso(value)
+    return obj
+
+def pack_entry(data: dict, expires_at: str, body: bytes, serializer: str = 'json',
+               compression: str = 'none', level: int = 3) -> bytes:
+    """
+    Storage bytes of an entry whose response body is `body` (see encode_entry).
+    
+    json + none keeps the canonical body as is; anything else gets the
+    compact header. msgpack drops the JSON punctuation and stores datetimes
+    as epoch ints.
+    """
+    if serializer == 'json' and compression == 'none':
+        return body
+    if serializer == 'msgpack':
+        core = {k: v for k, v in data.items() if k not in CACHE_FIELDS}
+        payload = msgpack.packb(_to_epoch({'data': core, 'cache_expires_at': expires_at}))
+    else:
+        payload = body
+    header = bytes((MAGIC, FORMAT_VERSION, SERIALIZERS[serializer], COMPRESSIONS[compression]))
+    return header + _compress(payload, compression, level)
+
+def _unpack_entry(raw: bytes) -> Tuple[bytes, str]:
+    """(response body, cache_expires_at) of a compact entry"""
+    version, serializer, compression = raw[1], raw[2], raw[3]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unknown cache entry version {version}")
+    payload = _decompress(raw[4:], compression)
+    if serializer == SERIALIZERS['msgpack']:
+        entry = msgpack.unpackb(payload, object_hook=_from_epoch)
+        return encode_entry(entry['data'], entry['cache_expires_at']), entry['cache_expires_at']
+    return decode_entry(payload)
+
+def pack_series(series: dict, expires_at: str, serializer: str = 'json',
+                compression: str = 'none', level: int = 3) -> bytes:
+    """Storage bytes of a forecast series (compact header, never a plain JSON body)"""
+    entry = {'series': series, 'cache_expires_at': expires_at}
+    payload = msgpack.packb(entry) if serializer == 'msgpack' else orjson.dumps(entry)
+    header = bytes((MAGIC, FORMAT_VERSION, SERIES_FLAG | SERIALIZERS[serializer], COMPRESSIONS[compression]))
+    return header + _compress(payload, compression, level)
+
+def unpack_series(raw: bytes) -> Tuple[dict, str]:
+    """(series, cache_expires_at) of a stored forecast series"""
+    if raw[:1] != b'\xff' or not raw[2] & SERIES_FLAG:
+        raise ValueError("Not a forecast series entry")
+    if raw[1] != FORMAT_VERSION:
+        raise ValueError(f"Unknown cache entry version {raw[1]}")
+    payload = _decompress(raw[4:], raw[3])
+    if raw[2] & ~SERIES_FLAG == SERIALIZERS['msgpack']:
+        entry = msgpack.unpackb(payload)
+    else:
+        entry = orjson.loads(payload)
+    return entry['series'], entry['cache_expires_at']
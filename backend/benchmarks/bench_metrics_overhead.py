@@ -0,0 +1,110 @@
+"""
+Cost of the metrics instrumentation on a cache-hit request.
+
+Serves L1 hits through the ASGI app in-process (no network, no Redis) and
+compares their latency with the cost of what instrumentation adds to that
+path: the request-latency middleware and the per-tier counter increment.
+Both costs are timed in isolation, since an A/B of full requests is
+dominated by run-to-run noise at this scale.
+
+    python -m benchmarks.bench_metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def hit_latency(requests: int) -> list:
+    """Latency (us) of /api/weather answered from the L1 cache"""
+    import httpx
+    from app.main import app
+    from app.models import WeatherResponse
+    from app.services.cache_service import cache_service, CachedPayload
+    from app.utils.normalizer import normalize_weather_data
+    from app.utils.payload import encode_entry
+    from benchmarks.stub_upstream import current_payload, forecast_payload
+
+    data = WeatherResponse(**normalize_weather_data(current_payload(), forecast_payload())).model_dump(mode='json')
+    expires_at = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    key = await cache_service.resolve_key(None, 48.85, 2.35)
+    cache_service._set_local(key, CachedPayload.of(encode_entry(data, expires_at), False, expires_at))
+
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(requests + 200):
+            start = time.perf_counter()
+            response = await client.get("/api/weather?lat=48.85&lon=2.35")
+            if i >= 200:  # warmup
+                samples.append((time.perf_counter() - start) * 1e6)
+            assert response.status_code == 200
+    return samples
+
+
+async def middleware_cost(number: int) -> float:
+    """Extra cost (us) of MetricsMiddleware around a minimal ASGI app"""
+    from app.utils.metrics import MetricsMiddleware
+
+    async def endpoint():
+        pass
+
+    async def bare(scope, receive, send):
+        scope['endpoint'] = endpoint
+        await send({'type': 'http.response.start', 'status': 200})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def receive():
+        return {}
+
+    async def send(message):
+        pass
+
+    async def timed(asgi_app):
+        start = time.perf_counter()
+        for _ in range(number):
+            await asgi_app({'type': 'http', 'method': 'GET'}, receive, send)
+        return (time.perf_counter() - start) / number * 1e6
+
+    wrapped = MetricsMiddleware(bare)
+    costs = []
+    for _ in range(3):
+        costs.append(await timed(wrapped) - await timed(bare))
+    return min(costs)
+
+
+def counter_cost(number: int) -> float:
+    """Cost (us) of one labelled counter increment"""
+    from app.utils.metrics import CACHE_REQUESTS
+    start = time.perf_counter()
+    for _ in range(number):
+        CACHE_REQUESTS.labels('l1', 'hit').inc()
+    return (time.perf_counter() - start) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+    os.environ["L1_INVALIDATION_PUBSUB"] = "false"
+
+    samples = asyncio.run(hit_latency(args.requests))
+    middleware = asyncio.run(middleware_cost(100000))
+    counter = counter_cost(100000)
+    p50 = _percentile(samples, 50)
+
+    print(f"cache hit          p50 {p50:8.1f}us   p99 {_percentile(samples, 99):8.1f}us")
+    print(f"middleware             {middleware:8.2f}us")
+    print(f"tier counter           {counter:8.2f}us")
+    print(f"overhead at p50        {(middleware + counter) / p50 * 100:8.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Cache-miss latency of WeatherService.get_weather against the local stub.
+
+Compares the serial path (city only: /weather then /forecast) with the
+concurrent path (coordinates known from the geocode cache). The upstream
+rate limiter is disabled, so no Redis is needed.
+
+    python -m benchmarks.bench_miss_latency --requests 200 --latency-ms 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+import uvicorn
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def start_stub(port: int):
+    """Runs the stub upstream in a background thread"""
+    from benchmarks.stub_upstream import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def run(requests: int, port: int):
+    from app.config import settings
+    settings.openweather_base_url = f"http://127.0.0.1:{port}/data/2.5"
+    settings.openweather_geo_url = f"http://127.0.0.1:{port}/geo/1.0"
+    settings.rate_limit_enabled = False  # Its token bucket lives in Redis: upstream path only, as in load_test
+    from app.services.weather_service import WeatherService
+
+    service = WeatherService()
+    await service.start()
+    results = {}
+    try:
+        for label, coords in (("serial", None), ("concurrent", (48.8566, 2.3522))):
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                await service.get_weather(city="Paris", coords=coords)
+                samples.append((time.perf_counter() - start) * 1000)
+            results[label] = samples
+    finally:
+        await service.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    os.environ["STUB_LATENCY_MS"] = str(args.latency_ms)
+    os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+    start_stub(args.port)
+
+    results = asyncio.run(run(args.requests, args.port))
+    print(f"{'path':<12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'mean (ms)':>11}")
+    for label, samples in results.items():
+        print(f"{label:<12}{_percentile(samples, 50):>10.1f}{_percentile(samples, 99):>10.1f}{statistics.mean(samples):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
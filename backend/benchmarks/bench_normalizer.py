@@ -0,0 +1,139 @@
+"""
+Micro-benchmark of the forecast normalizer on stub payloads, next to the
+implementation it replaced (baseline_*, the per-item datetime and
+max(set, key=list.count) version) as a reference.
+
+    python -m benchmarks.bench_normalizer --repeat 20
+"""
+import argparse
+import os
+import timeit
+from datetime import datetime
+from typing import List
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from app.utils.normalizer import normalize_weather_data, compact_forecast, forecast_view, _aggregate_daily_forecasts, _local_days, _server_offset
+from benchmarks.stub_upstream import current_payload, forecast_payload
+
+
+# Baseline: the normalizer before the single-pass columnar aggregation
+def baseline_normalize_weather_data(current_data: dict, forecast_data: dict) -> dict:
+    """normalize_weather_data before the columnar rewrite (verbatim)"""
+    
+    # Extract current weather data
+    current = {
+        'temperature': round(current_data['main']['temp'], 1),
+        'feels_like': round(current_data['main']['feels_like'], 1),
+        'condition': current_data['weather'][0]['main'],
+        'condition_description': current_data['weather'][0]['description'].capitalize(),
+        'icon': current_data['weather'][0]['icon'],
+        'humidity': current_data['main']['humidity'],
+        'wind_speed': round(current_data['wind']['speed'] * 3.6, 1),  # m/s -> km/h
+        'precipitation_probability': 0,  # Not available in current weather
+        'timestamp': datetime.utcnow()
+    }
+    
+    # Hourly forecasts (next 12 hours)
+    hourly = []
+    for item in forecast_data['list'][:12]:
+        hourly.append({
+            'time': datetime.fromtimestamp(item['dt']),
+            'temperature': round(item['main']['temp'], 1),
+            'condition': item['weather'][0]['main'],
+            'icon': item['weather'][0]['icon'],
+            'precipitation_probability': int(item.get('pop', 0) * 100),
+            'wind_speed': round(item['wind']['speed'] * 3.6, 1)
+        })
+    
+    # Daily forecasts (3 days)
+    daily = _baseline_aggregate_daily_forecasts(forecast_data['list'][:24])
+    
+    return {
+        'city': current_data['name'],
+        'country': current_data['sys']['country'],
+        'latitude': current_data['coord']['lat'],
+        'longitude': current_data['coord']['lon'],
+        'timezone': forecast_data['city']['timezone'],
+        'current': current,
+        'hourly': hourly,
+        'daily': daily[:3],
+        'cached': False
+    }
+
+
+def _baseline_aggregate_daily_forecasts(forecast_list: List[dict]) -> List[dict]:
+    """_aggregate_daily_forecasts before the columnar rewrite (verbatim)"""
+    daily_data = {}
+    
+    for item in forecast_list:
+        dt = datetime.fromtimestamp(item['dt'])
+        date_key = dt.date()
+        
+        if date_key not in daily_data:
+            daily_data[date_key] = {
+                'temps': [],
+                'conditions': [],
+                'icons': [],
+                'precip_probs': [],
+                'humidity': []
+            }
+        
+        daily_data[date_key]['temps'].append(item['main']['temp'])
+        daily_data[date_key]['conditions'].append(item['weather'][0]['main'])
+        daily_data[date_key]['icons'].append(item['weather'][0]['icon'])
+        daily_data[date_key]['precip_probs'].append(item.get('pop', 0) * 100)
+        daily_data[date_key]['humidity'].append(item['main']['humidity'])
+    
+    # Transform into a list of daily forecasts
+    daily_forecasts = []
+    for date, data in sorted(daily_data.items())[:3]:
+        # Dominant condition (most frequent)
+        most_common_condition = max(set(data['conditions']), key=data['conditions'].count)
+        # Corresponding icon (take the one at noon if possible)
+        mid_idx = len(data['icons']) // 2
+        icon = data['icons'][mid_idx] if data['icons'] else '01d'
+        
+        daily_forecasts.append({
+            'date': datetime.combine(date, datetime.min.time()),
+            'temp_min': round(min(data['temps']), 1),
+            'temp_max': round(max(data['temps']), 1),
+            'condition': most_common_condition,
+            'icon': icon,
+            'precipitation_probability': int(max(data['precip_probs'])),
+            'humidity': int(sum(data['humidity']) / len(data['humidity']))
+        })
+    
+    return daily_forecasts
+
+
+def run(repeat: int, number: int = 2000) -> dict:
+    """Best-of-`repeat` microseconds per call"""
+    current, forecast = current_payload(), forecast_payload(start=1760000000)
+    series = compact_forecast(current, forecast)
+    days = _local_days(series["dt"], _server_offset(series["dt"], 12, 3), 3)
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+    return {
+        "normalize_weather_data": best(lambda: normalize_weather_data(current, forecast)),
+        "aggregate_daily_forecasts": best(lambda: _aggregate_daily_forecasts(series, days)),
+        "compact_forecast": best(lambda: compact_forecast(current, forecast)),
+        "forecast_view_5d_imperial": best(lambda: forecast_view(series, 40, 5, "imperial", "location")),
+        "baseline_normalize_weather_data": best(lambda: baseline_normalize_weather_data(current, forecast)),
+        "baseline_aggregate_daily_forecasts": best(lambda: _baseline_aggregate_daily_forecasts(forecast["list"][:24])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, micros in run(args.repeat).items():
+        print(f"{name:<36}{micros:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of cache entry serialization on a stub response.
+
+    python -m benchmarks.bench_serialization --repeat 20
+"""
+import argparse
+import os
+import timeit
+from datetime import datetime, timedelta
+
+import orjson
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from app.models import WeatherResponse
+from app.utils.normalizer import normalize_weather_data
+from app.utils.payload import encode_entry, decode_entry, mark_stale, pack_entry
+from benchmarks.stub_upstream import current_payload, forecast_payload
+
+
+def run(repeat: int, number: int = 2000) -> dict:
+    """Best-of-`repeat` microseconds per call"""
+    response = WeatherResponse(**normalize_weather_data(current_payload(), forecast_payload(start=1760000000)))
+    data = response.model_dump(mode='json')
+    entry = encode_entry(data, (datetime.utcnow() + timedelta(hours=1)).isoformat())
+    body, expires_at = decode_entry(entry)
+    zlib_entry = pack_entry(data, expires_at, body, 'json', 'zlib')
+    msgpack_entry = pack_entry(data, expires_at, body, 'msgpack', 'zlib')
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+    return {
+        "model_dump": best(lambda: response.model_dump(mode='json')),
+        "encode_entry": best(lambda: encode_entry(data, "2030-01-01T00:00:00")),
+        "decode_entry": best(lambda: decode_entry(entry)),
+        "pack_json_zlib": best(lambda: pack_entry(data, expires_at, body, 'json', 'zlib')),
+        "decode_json_zlib": best(lambda: decode_entry(zlib_entry)),
+        "pack_msgpack_zlib": best(lambda: pack_entry(data, expires_at, body, 'msgpack', 'zlib')),
+        "decode_msgpack_zlib": best(lambda: decode_entry(msgpack_entry)),
+        "mark_stale": best(lambda: mark_stale(body)),
+        "model_from_body": best(lambda: WeatherResponse(**orjson.loads(body))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, micros in run(args.repeat).items():
+        print(f"{name:<28}{micros:>8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
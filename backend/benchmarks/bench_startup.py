@@ -0,0 +1,77 @@
+"""
+Worker boot time: how fast a new pod can take traffic.
+
+Measures, over fresh processes:
+    import      `import app.main` (interpreter start included)
+    ready       `python -m app.server` launch -> first /health answer
+
+The workers' own import/startup split is logged as "worker ready" and
+exported as weather_startup_duration_seconds. Redis does not need to be up
+(/health then reports it disconnected).
+
+    python -m benchmarks.bench_startup --runs 5 --workers 1
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def import_time() -> float:
+    """Seconds to start an interpreter and import the app"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND, env=_env(), check=True)
+    return time.perf_counter() - start
+
+
+def ready_time(port: int, workers: int, timeout: float = 60) -> float:
+    """Seconds from launching the production server to its first /health answer"""
+    env = _env(API_PORT=str(port), WEB_CONCURRENCY=str(workers), LOG_LEVEL="WARNING")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "app.server"], cwd=BACKEND, env=env)
+    try:
+        # Cheap polling (a TCP connect): the server must not compete with the probe for CPU
+        while time.perf_counter() - start < timeout:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            except OSError:
+                time.sleep(0.01)
+                continue
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=5).raise_for_status()
+            return time.perf_counter() - start
+        raise RuntimeError("Server did not answer")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _env(**extra) -> dict:
+    env = dict(os.environ, **extra)
+    env.setdefault("OPENWEATHER_API_KEY", "benchmark")
+    env.setdefault("REFRESH_AHEAD_ENABLED", "false")
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.runs)]
+    readies = [ready_time(args.port, args.workers) for _ in range(args.runs)]
+    for name, samples in (("import", imports), (f"ready ({args.workers} workers)", readies)):
+        print(f"{name:<22} median {statistics.median(samples) * 1000:8.0f} ms   max {max(samples) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
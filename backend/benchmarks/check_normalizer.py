@@ -0,0 +1,110 @@
+"""
+Equivalence check of the forecast normalizer against the implementation it
+replaced (benchmarks.bench_normalizer.baseline_normalize_weather_data).
+
+Random 3-hour forecast payloads, server timezone switched through TZ
+(DST transitions included), compared field by field on the standard
+response. Days where the dominant condition is a tie are excluded: the
+baseline broke ties in set order (per-process hash seed), the current
+code by earliest occurrence. The baseline only read the first 24 slots,
+so both get the same 24-slot payload.
+
+    python -m benchmarks.check_normalizer --payloads 3000 --tz Europe/Paris
+
+Exits with status 1 on the first mismatch. POSIX only (time.tzset).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from app.utils.normalizer import normalize_weather_data
+from benchmarks.bench_normalizer import baseline_normalize_weather_data
+from benchmarks.stub_upstream import current_payload
+
+TIMEZONES = ["UTC", "Europe/Paris", "America/New_York", "Asia/Kolkata", "Australia/Lord_Howe"]
+CONDITIONS = [("Clear", "01d"), ("Clouds", "03d"), ("Rain", "10d"), ("Snow", "13d")]
+# Near the EU/US DST changes of 2024-2026 (30% of payloads), otherwise anywhere
+DST_CHANGES = [1711846800, 1730595600, 1743296400, 1762045200, 1774746000]
+
+
+def random_forecast(rng: random.Random) -> dict:
+    """Random /forecast payload of up to 24 3-hour slots"""
+    if rng.random() < 0.3:
+        start = rng.choice(DST_CHANGES) + rng.randint(-2, 2) * 86400
+    else:
+        start = rng.randint(1_600_000_000, 1_800_000_000)
+    start = start // 10800 * 10800
+    items = []
+    for i in range(rng.choice([0, 1, 5, 8, 12, 24])):
+        condition, icon = rng.choice(CONDITIONS)
+        item = {
+            "dt": start + i * 10800,
+            "main": {"temp": rng.choice([rng.uniform(-30, 40), rng.randint(-10, 30)]), "humidity": rng.randint(0, 100)},
+            "weather": [{"main": condition, "icon": icon}],
+            "wind": {"speed": rng.uniform(0, 20)},
+        }
+        if rng.random() < 0.9:
+            item["pop"] = rng.choice([0, 1, rng.random()])
+        items.append(item)
+    return {"city": {"timezone": rng.randint(-12, 14) * 3600}, "list": items}
+
+
+def has_tie(forecast: dict) -> bool:
+    """True if one of the first 3 local days has no single dominant condition"""
+    days = {}
+    for item in forecast["list"]:
+        days.setdefault(datetime.fromtimestamp(item["dt"]).date(), []).append(item["weather"][0]["main"])
+    for day in sorted(days)[:3]:
+        counts = Counter(days[day]).most_common(2)
+        if len(counts) > 1 and counts[0][1] == counts[1][1]:
+            return True
+    return False
+
+
+def comparable(response: dict) -> dict:
+    """Response without the fetch timestamp (utcnow on each side)"""
+    return {**response, "current": {k: v for k, v in response["current"].items() if k != "timestamp"}}
+
+
+def check(payloads: int, seed: int, timezones) -> bool:
+    """Compares `payloads` random payloads per timezone, True if all matched"""
+    ok = True
+    for tz in timezones:
+        os.environ["TZ"] = tz
+        time.tzset()
+        rng = random.Random(f"{seed}:{tz}")
+        checked = ties = 0
+        for _ in range(payloads):
+            current, forecast = current_payload(), random_forecast(rng)
+            if has_tie(forecast):
+                ties += 1
+                continue
+            expected = comparable(baseline_normalize_weather_data(current, forecast))
+            actual = comparable(normalize_weather_data(current, forecast))
+            if actual != expected:
+                print(f"{tz}: mismatch for {forecast}\n  baseline {expected}\n  current  {actual}")
+                ok = False
+                break
+            checked += 1
+        print(f"{tz:<22}{checked:>7} identical{ties:>7} skipped (ties)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=3000, help="payloads per timezone")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tz", action="append", help="server timezone(s) to check (default: a DST-heavy set)")
+    args = parser.parse_args()
+
+    sys.exit(0 if check(args.payloads, args.seed, args.tz or TIMEZONES) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Load scenarios against the API, in-process, with the local OpenWeatherMap
+stub and fakeredis (or a local Redis).
+
+Scenarios:
+    hot_key     one city, cached after the first request (L1/L2 hit path)
+    cold_miss   unique coordinates, every request goes upstream
+    zipf        cities drawn from a Zipf distribution over the most populated ones
+    search      autocomplete bursts (typed prefixes, some unknown names going upstream)
+    views       zipf cities with random response views (hours/days/units/tz), one fetch per city
+
+Requests go through the ASGI app (no client-side HTTP), so the numbers
+measure the API itself; the stub runs in its own process so that it does
+not compete for the GIL. Runs are reproducible for a given --seed.
+
+    python -m benchmarks.load_test --scenario zipf --requests 5000 --concurrency 50
+    python -m benchmarks.load_test --redis-url redis://localhost:6379/15  # flushes that DB
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+SCENARIOS = ("hot_key", "cold_miss", "zipf", "search", "views")
+CITIES_FILE = Path(__file__).resolve().parent.parent / "app" / "data" / "cities.tsv"
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def top_cities(n: int) -> List[str]:
+    """Names of the n most populated cities of the bundled index"""
+    rows = []
+    with open(CITIES_FILE, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            rows.append((int(fields[6]), fields[1]))
+    rows.sort(reverse=True)
+    return [name for _, name in rows[:n]]
+
+
+def build_paths(scenario: str, requests: int, rng: random.Random, cities: List[str],
+                zipf_s: float = 1.1) -> Tuple[List[str], List[str]]:
+    """(warmup paths, measured paths) of a scenario"""
+    if scenario == "hot_key":
+        return ["/api/weather?city=Paris"], ["/api/weather?city=Paris"] * requests
+
+    if scenario == "cold_miss":
+        # 0.1 degree apart: distinct cells, beyond the nearest-cell radius
+        return [], [
+            f"/api/weather?lat={-60 + (i // 3000) * 0.1:.2f}&lon={-150 + (i % 3000) * 0.1:.2f}"
+            for i in range(requests)
+        ]
+
+    if scenario == "zipf":
+        weights = [1 / rank ** zipf_s for rank in range(1, len(cities) + 1)]
+        return [], [f"/api/weather?city={city}" for city in rng.choices(cities, weights, k=requests)]
+
+    if scenario == "views":
+        weights = [1 / rank ** zipf_s for rank in range(1, len(cities) + 1)]
+        return [], [
+            f"/api/weather?city={city}&hours={rng.randint(1, 40)}&days={rng.randint(1, 5)}"
+            f"&units={rng.choice(('metric', 'imperial', 'standard'))}&tz={rng.choice(('server', 'location', 'utc'))}"
+            for city in rng.choices(cities, weights, k=requests)
+        ]
+
+    if scenario == "search":
+        paths = []
+        while len(paths) < requests:
+            if rng.random() < 0.05:
+                name = "".join(rng.choices(string.ascii_lowercase, k=8))  # Unknown locally
+            else:
+                name = rng.choice(cities)
+            paths.extend(f"/api/search?q={name[:n]}" for n in range(2, min(len(name), 8) + 1))
+        return [], paths[:requests]
+
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def _drive(client, paths: List[str], concurrency: int) -> Tuple[List[float], Counter, float]:
+    """Sends the paths with `concurrency` concurrent clients"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pending = iter(paths)
+
+    async def worker():
+        for path in pending:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start
+
+
+def start_stub_process(port: int, latency_ms: float, error_rate: float) -> subprocess.Popen:
+    """Runs the stub upstream in a separate process, returns once it answers"""
+    import httpx
+    env = dict(os.environ, STUB_LATENCY_MS=str(latency_ms), STUB_ERROR_RATE=str(error_rate))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_upstream:app",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=env, cwd=Path(__file__).resolve().parent.parent
+    )
+    for _ in range(200):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats")
+            return process
+        except httpx.TransportError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Stub upstream did not start")
+
+
+def _configure(port: int, redis_url: Optional[str]):
+    """Points the app at the stub and the chosen Redis (before it is imported)"""
+    os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+    os.environ["OPENWEATHER_BASE_URL"] = f"http://127.0.0.1:{port}/data/2.5"
+    os.environ["OPENWEATHER_GEO_URL"] = f"http://127.0.0.1:{port}/geo/1.0"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["REFRESH_AHEAD_ENABLED"] = "false"
+    os.environ["L1_INVALIDATION_PUBSUB"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app.services.cache_service import cache_service
+    if redis_url:
+        import redis.asyncio as redis
+        cache_service.client = redis.Redis.from_url(redis_url, max_connections=50)
+    else:
+        import fakeredis
+        cache_service.client = fakeredis.aioredis.FakeRedis()
+
+
+async def run(scenarios=SCENARIOS, requests: int = 2000, concurrency: int = 50, latency_ms: float = 20,
+              error_rate: float = 0.0, redis_url: Optional[str] = None, seed: int = 42,
+              port: int = 9000, cities: int = 1000) -> Dict[str, dict]:
+    """Runs the scenarios, each on an empty cache; returns one summary per scenario"""
+    import httpx
+
+    _configure(port, redis_url)
+    from app.main import app
+    from app.services.cache_service import cache_service
+
+    stub = start_stub_process(port, latency_ms, error_rate)
+    names = top_cities(cities)
+    results = {}
+    try:
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client, \
+                    httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as stub_client:
+                for scenario in scenarios:
+                    await cache_service.client.flushdb()
+                    if cache_service.local is not None:
+                        cache_service.local.clear()
+                    warmup, paths = build_paths(scenario, requests, random.Random(seed), names)
+                    for path in warmup:
+                        await client.get(path)
+
+                    cache_before = dict(cache_service.stats)
+                    calls_before = Counter((await stub_client.get("/stats")).json())
+                    latencies, statuses, elapsed = await _drive(client, paths, concurrency)
+                    calls = Counter((await stub_client.get("/stats")).json()) - calls_before
+                    results[scenario] = {
+                        "requests": len(latencies),
+                        "concurrency": concurrency,
+                        "seconds": round(elapsed, 3),
+                        "throughput": round(len(latencies) / elapsed, 1),
+                        "p50_ms": round(_percentile(latencies, 50), 3),
+                        "p95_ms": round(_percentile(latencies, 95), 3),
+                        "p99_ms": round(_percentile(latencies, 99), 3),
+                        "mean_ms": round(sum(latencies) / len(latencies), 3),
+                        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+                        "upstream_calls": dict(calls),
+                        "cache": {k: v - cache_before[k] for k, v in cache_service.stats.items()},
+                    }
+    finally:
+        stub.terminate()
+        stub.wait()
+    return results
+
+
+def print_results(results: Dict[str, dict]):
+    print(f"{'scenario':<11}{'req/s':>9}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}  statuses / upstream calls")
+    for scenario, r in results.items():
+        print(f"{scenario:<11}{r['throughput']:>9.0f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"  {r['statuses']} {r['upstream_calls']}")
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20, help="stub upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub 500 responses")
+    parser.add_argument("--redis-url", default=None, help="local Redis instead of fakeredis (the DB is flushed)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=9000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(
+        SCENARIOS if args.scenario == "all" else (args.scenario,),
+        args.requests, args.concurrency, args.latency_ms, args.error_rate, args.redis_url, args.seed, args.port
+    ))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Local OpenWeatherMap stub for benchmarks.
+
+Serves canned /data/2.5/weather, /data/2.5/forecast and /geo/1.0/direct
+payloads with a configurable artificial latency (STUB_LATENCY_MS) and
+error rate (STUB_ERROR_RATE, fraction of 500 responses). Each city name
+gets its own deterministic coordinates.
+
+    uvicorn benchmarks.stub_upstream:app --port 9000
+"""
+import asyncio
+import os
+import random
+import time
+import zlib
+from collections import Counter
+from typing import Optional, Tuple
+
+from fastapi import FastAPI, Query, Response
+
+LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+
+# Calls served per endpoint (weather, forecast, geo), errors included
+calls: Counter = Counter()
+
+app = FastAPI(title="OpenWeatherMap stub")
+
+
+def configure(latency_ms: Optional[float] = None, error_rate: Optional[float] = None):
+    """Changes latency / error rate of a stub running in-process"""
+    global LATENCY_MS, ERROR_RATE
+    if latency_ms is not None:
+        LATENCY_MS = latency_ms
+    if error_rate is not None:
+        ERROR_RATE = error_rate
+
+
+def city_coords(name: str) -> Tuple[float, float]:
+    """Deterministic coordinates of a city name"""
+    h = zlib.crc32(name.lower().encode())
+    return round((h % 17000) / 100 - 85, 4), round((h // 17000 % 36000) / 100 - 180, 4)
+
+
+def current_payload(name: str = "Paris", lat: float = 48.8566, lon: float = 2.3522) -> dict:
+    """Canned /weather response"""
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [{"main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "main": {"temp": 15.23, "feels_like": 14.07, "humidity": 62},
+        "wind": {"speed": 3.6},
+        "name": name,
+        "sys": {"country": "FR"},
+    }
+
+
+def forecast_payload(cnt: int = 40, start: Optional[int] = None) -> dict:
+    """Canned /forecast response (3-hour steps)"""
+    start = start if start is not None else int(time.time()) // 10800 * 10800
+    conditions = ["Clear", "Clouds", "Rain", "Clouds"]
+    return {
+        "city": {"timezone": 3600},
+        "list": [
+            {
+                "dt": start + i * 10800,
+                "main": {"temp": 8 + (i * 7) % 11 + 0.25, "humidity": 50 + (i * 3) % 40},
+                "weather": [{"main": conditions[i % 4], "icon": f"{(i % 4) + 1:02d}d"}],
+                "pop": (i % 5) / 5,
+                "wind": {"speed": 1.5 + (i % 6) * 0.7},
+            }
+            for i in range(cnt)
+        ],
+    }
+
+
+async def _delay(endpoint: str) -> bool:
+    """Counts the call, sleeps, returns True if this call should fail"""
+    calls[endpoint] += 1
+    if LATENCY_MS > 0:
+        await asyncio.sleep(LATENCY_MS / 1000)
+    return ERROR_RATE > 0 and random.random() < ERROR_RATE
+
+
+@app.get("/stats")
+async def stats():
+    """Calls served so far, per endpoint"""
+    return dict(calls)
+
+
+@app.get("/data/2.5/weather")
+async def weather(q: Optional[str] = None, lat: Optional[float] = None, lon: Optional[float] = None):
+    if await _delay("weather"):
+        return Response(status_code=500)
+    if q:
+        name = q.split(",")[0].strip().title()
+        return current_payload(name, *city_coords(name))
+    return current_payload(lat=lat, lon=lon)
+
+
+@app.get("/data/2.5/forecast")
+async def forecast(cnt: int = Query(40)):
+    if await _delay("forecast"):
+        return Response(status_code=500)
+    return forecast_payload(cnt)
+
+
+@app.get("/geo/1.0/direct")
+async def direct(q: str, limit: int = 5):
+    if await _delay("geo"):
+        return Response(status_code=500)
+    lat, lon = city_coords(q)
+    return [
+        {"name": q.title(), "country": "FR", "state": "", "lat": lat + i, "lon": lon + i}
+        for i in range(limit)
+    ]
@@ -0,0 +1,114 @@
+"""
+Full benchmark suite: load scenarios + normalizer and serialization
+micro-benchmarks, written to a JSON file that later runs can be compared
+against.
+
+    python -m benchmarks.suite --out results.json
+    python -m benchmarks.suite --out new.json --compare results.json --threshold 10
+
+With --compare, exits with status 1 if a metric regressed by more than
+--threshold percent (latencies and micro-benchmarks up, throughput down).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Iterator, Tuple
+
+from benchmarks import load_test
+
+# Metrics where higher is better; everything else compared is a duration
+HIGHER_IS_BETTER = {"throughput"}
+LOAD_METRICS = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(args) -> dict:
+    load = asyncio.run(load_test.run(
+        load_test.SCENARIOS, args.requests, args.concurrency, args.latency_ms,
+        args.error_rate, args.redis_url, args.seed, args.port
+    ))
+    # Imported after the load run: it configures the app settings through the environment
+    from benchmarks import bench_normalizer, bench_serialization
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "redis": "local" if args.redis_url else "fakeredis",
+            "params": {
+                "requests": args.requests, "concurrency": args.concurrency, "latency_ms": args.latency_ms,
+                "error_rate": args.error_rate, "seed": args.seed
+            },
+        },
+        "load": load,
+        "micro_us": {
+            **{f"normalizer.{k}": round(v, 2) for k, v in bench_normalizer.run(args.repeat).items()},
+            **{f"serialization.{k}": round(v, 2) for k, v in bench_serialization.run(args.repeat).items()},
+        },
+    }
+
+
+def _metrics(results: dict) -> Iterator[Tuple[str, str, float]]:
+    """(name, kind, value) of every compared metric"""
+    for scenario, summary in results["load"].items():
+        for metric in LOAD_METRICS:
+            yield f"{scenario}.{metric}", metric, summary[metric]
+    for name, value in results["micro_us"].items():
+        yield name, "micro_us", value
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Prints the change of each metric; True if none regressed beyond the threshold"""
+    before = {name: value for name, _, value in _metrics(baseline)}
+    ok = True
+    print(f"\n{'metric':<40}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, kind, value in _metrics(current):
+        if name not in before or not before[name]:
+            continue
+        change = (value - before[name]) / before[name] * 100
+        regressed = -change > threshold if kind in HIGHER_IS_BETTER else change > threshold
+        ok = ok and not regressed
+        print(f"{name:<40}{before[name]:>12.2f}{value:>12.2f}{change:>+8.1f}%{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load_test.add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=20, help="micro-benchmark repetitions")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="baseline results file")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    results = run(args)
+    load_test.print_results(results["load"])
+    print()
+    for name, micros in results["micro_us"].items():
+        print(f"{name:<40}{micros:>8.1f} us")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
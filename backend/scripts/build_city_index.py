@@ -0,0 +1,65 @@
+"""
+Builds the offline city index (app/data/cities.tsv) from a GeoNames dump.
+
+    python -m scripts.build_city_index cities15000.txt --admin1 admin1CodesASCII.txt
+
+Dumps: https://download.geonames.org/export/dump/ (CC BY 4.0)
+"""
+import argparse
+import csv
+import sys
+
+from app.services.city_index import BUNDLED_INDEX, normalize
+
+# Columns of the GeoNames "geoname" table
+NAME, LATITUDE, LONGITUDE, FEATURE_CODE, COUNTRY, ADMIN1, POPULATION = 1, 4, 5, 7, 8, 10, 14
+
+# Not cities: sections of a city (arrondissements, districts), historical,
+# abandoned and destroyed places
+EXCLUDED_FEATURES = {"PPLX", "PPLH", "PPLQ", "PPLW"}
+
+
+def load_admin1(path: str) -> dict:
+    """'US.CA' -> 'California'"""
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            names[row[0]] = row[1]
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cities", help="GeoNames cities dump (e.g. cities15000.txt)")
+    parser.add_argument("--admin1", help="admin1CodesASCII.txt, for state names")
+    parser.add_argument("--min-population", type=int, default=0)
+    parser.add_argument("--output", default=str(BUNDLED_INDEX))
+    args = parser.parse_args()
+
+    admin1 = load_admin1(args.admin1) if args.admin1 else {}
+    rows = []
+    with open(args.cities, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            population = int(row[POPULATION] or 0)
+            if population < args.min_population or row[FEATURE_CODE] in EXCLUDED_FEATURES:
+                continue
+            rows.append((
+                normalize(row[NAME]),
+                row[NAME],
+                row[COUNTRY],
+                admin1.get(f"{row[COUNTRY]}.{row[ADMIN1]}", ""),
+                row[LATITUDE],
+                row[LONGITUDE],
+                str(population),
+            ))
+
+    # Sorted by UTF-8 bytes of the key, as the index bisects on raw bytes
+    rows.sort(key=lambda r: (r[0].encode(), -int(r[6])))
+    with open(args.output, "w", encoding="utf-8", newline="\n") as out:
+        for r in rows:
+            out.write("\t".join(r) + "\n")
+    print(f"{len(rows)} cities -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
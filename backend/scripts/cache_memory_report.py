@@ -0,0 +1,166 @@
+"""
+Reports cache memory per storage format (CACHE_FORMAT x CACHE_COMPRESSION).
+
+Samples weather entries (standard responses) and forecast series from
+Redis, re-encodes each one in every format and prints bytes per entry and
+the projected size of the whole keyspace, per kind and in total, plus the
+size of the nearest-cell index (format independent). Without a reachable
+Redis (--synthetic), a stub entry of each kind is used instead.
+
+    python -m scripts.cache_memory_report --redis-url redis://localhost:6379/0 --sample 500
+    python -m scripts.cache_memory_report --synthetic --keys 300000
+"""
+import argparse
+import os
+import random
+import statistics
+from itertools import product
+
+import orjson
+import redis
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "report")
+
+from app.utils.payload import COMPRESSIONS, SERIALIZERS, decode_entry, pack_entry, pack_series, unpack_series, zstandard
+
+PATTERNS = ("weather:city:*", "weather:coords:*")
+SERIES_PATTERNS = ("forecast:city:*", "forecast:coords:*")
+INDEX_KEYS = ("weather:cells", "weather:cells:expiry")
+
+
+def formats():
+    """(serializer, compression) pairs usable here"""
+    return [
+        (serializer, compression)
+        for serializer, compression in product(SERIALIZERS, COMPRESSIONS)
+        if compression != "zstd" or zstandard is not None
+    ]
+
+
+def synthetic_entries() -> tuple:
+    """One stub weather entry and its forecast series, as stored by CacheService (json, no compression)"""
+    from datetime import datetime, timedelta
+    from app.models import WeatherResponse
+    from app.utils.normalizer import compact_forecast, forecast_view
+    from app.utils.payload import encode_entry
+    from benchmarks.stub_upstream import current_payload, forecast_payload
+
+    expires_at = (datetime.utcnow() + timedelta(minutes=30)).isoformat()
+    series = compact_forecast(current_payload(), forecast_payload())
+    data = WeatherResponse(**forecast_view(series)).model_dump(mode='json')
+    return [encode_entry(data, expires_at)], [pack_series(series, expires_at)]
+
+
+def sample_entries(client: redis.Redis, patterns: tuple, sample: int) -> tuple:
+    """(key count, sampled raw entries, average per-key overhead in bytes)"""
+    keys = [key for pattern in patterns for key in client.scan_iter(match=pattern, count=1000)]
+    picked = random.sample(keys, min(sample, len(keys)))
+    entries, overheads = [], []
+    for key in picked:
+        raw = client.get(key)
+        if raw is None:
+            continue
+        entries.append(raw)
+        try:
+            usage = client.memory_usage(key, samples=0)
+        except redis.ResponseError:  # MEMORY USAGE unavailable (e.g. managed Redis)
+            usage = None
+        if usage:
+            overheads.append(usage - len(raw))
+    return len(keys), entries, statistics.mean(overheads) if overheads else 0
+
+
+def index_sizes(client: redis.Redis) -> list:
+    """(key, members, bytes or None) of the nearest-cell index sorted sets"""
+    sizes = []
+    for key in INDEX_KEYS:
+        try:
+            usage = client.memory_usage(key, samples=0)
+        except redis.ResponseError:
+            usage = None
+        sizes.append((key, client.zcard(key), usage))
+    return sizes
+
+
+def measure(entries: list, level: int) -> dict:
+    """Average stored bytes per weather entry for each format"""
+    sizes = {fmt: [] for fmt in formats()}
+    for raw in entries:
+        body, expires_at = decode_entry(raw)
+        data = orjson.loads(body)
+        for serializer, compression in sizes:
+            sizes[(serializer, compression)].append(
+                len(pack_entry(data, expires_at, body, serializer, compression, level))
+            )
+    return {fmt: statistics.mean(values) for fmt, values in sizes.items()}
+
+
+def measure_series(entries: list, level: int) -> dict:
+    """Average stored bytes per forecast series for each format"""
+    sizes = {fmt: [] for fmt in formats()}
+    for raw in entries:
+        series, expires_at = unpack_series(raw)
+        for serializer, compression in sizes:
+            sizes[(serializer, compression)].append(len(pack_series(series, expires_at, serializer, compression, level)))
+    return {fmt: statistics.mean(values) for fmt, values in sizes.items()}
+
+
+def report(title: str, sizes: dict, overhead: float, key_count: int):
+    """Bytes per entry and projected keyspace size per format, smallest first"""
+    baseline = sizes[("json", "none")]
+    print(f"\n{title:<18}{'bytes/entry':>12}{'ratio':>8}{'keyspace (MB)':>15}")
+    for (serializer, compression), size in sorted(sizes.items(), key=lambda item: item[1]):
+        total = (size + overhead) * key_count / 1e6
+        print(f"{serializer + '+' + compression:<18}{size:>12.0f}{baseline / size:>7.1f}x{total:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--sample", type=int, default=500, help="entries re-encoded per format")
+    parser.add_argument("--synthetic", action="store_true", help="use a stub entry instead of Redis")
+    parser.add_argument("--keys", type=int, default=100000, help="keyspace size for --synthetic projections")
+    parser.add_argument("--level", type=int, default=3, help="compression level")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        entries, series_entries = synthetic_entries()
+        key_count, overhead = series_count, series_overhead = args.keys, 0
+    else:
+        client = redis.Redis.from_url(args.redis_url)
+        key_count, entries, overhead = sample_entries(client, PATTERNS, args.sample)
+        series_count, series_entries, series_overhead = sample_entries(client, SERIES_PATTERNS, args.sample)
+        if not entries and not series_entries:
+            print("No weather or forecast entries found (use --synthetic for an estimate)")
+            return
+        for kind, count, sampled, per_key in (
+            ("weather", key_count, entries, overhead), ("forecast", series_count, series_entries, series_overhead)
+        ):
+            if sampled:
+                print(f"{count} {kind} keys, {len(sampled)} sampled, ~{per_key:.0f} bytes of Redis overhead per key, "
+                      f"{statistics.mean(len(raw) for raw in sampled):.0f} bytes/entry as stored")
+
+    sizes = measure(entries, args.level) if entries else {}
+    series_sizes = measure_series(series_entries, args.level) if series_entries else {}
+    if sizes:
+        report("weather", sizes, overhead, key_count)
+    if series_sizes:
+        report("forecast", series_sizes, series_overhead, series_count)
+    if sizes and series_sizes:
+        print(f"\n{'total':<18}{'keyspace (MB)':>35}")
+        totals = {
+            fmt: ((sizes[fmt] + overhead) * key_count + (series_sizes[fmt] + series_overhead) * series_count) / 1e6
+            for fmt in sizes
+        }
+        for (serializer, compression), total in sorted(totals.items(), key=lambda item: item[1]):
+            print(f"{serializer + '+' + compression:<18}{total:>35.1f}")
+
+    if not args.synthetic:
+        print()
+        for key, members, usage in index_sizes(client):
+            size = f"{usage / 1e6:.1f} MB" if usage is not None else "size unavailable"
+            print(f"{key}: {members} cells, {size} (any format)")
+
+
+if __name__ == "__main__":
+    main()
@@ -39,6 +39,7 @@ export interface WeatherResponse {
   hourly: HourlyForecast[];
   daily: DailyForecast[];
   cached: boolean;
+  stale?: boolean;
   cache_expires_at?: string;
 }
 